@@ -0,0 +1,121 @@
+import glob
+import os
+import sys
+import time
+import traceback
+from threading import Thread
+from typing import List, Optional
+
+import checkpoint
+from engine import Simulation
+
+
+class Autosaver:
+    """Periodic checkpoints of a running simulation, written in the background.
+
+    Call ``update`` once per step. Every ``interval`` steps the process
+    forks and the child, which sees a copy-on-write image of the world
+    frozen at that moment, writes the checkpoint while the parent keeps
+    stepping; the parent only pays for the fork itself. Where ``os.fork`` is
+    missing the arrays are copied out with ``checkpoint.snapshot`` and a
+    thread writes them. Only the ``keep`` most recently written checkpoints
+    are kept; after a rewind these can have lower step numbers than older
+    ones. The directory is created with the first save.
+
+    A save is skipped, not queued, while the previous one is still being
+    written, so a slow disk never piles up writers.
+    """
+
+    def __init__(self, simulation: Simulation, directory: str = 'autosaves', interval: int = 1000,
+                 keep: int = 3, fork: bool = None) -> None:
+        if keep < 1:
+            raise ValueError(f"keep must be at least 1, got {keep}")
+        self.simulation = simulation
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.fork = hasattr(os, 'fork') if fork is None else fork
+        self.last_step = simulation.steps
+        self.pause = 0.0
+        self.failures = 0
+        self.child: Optional[int] = None
+        self.thread: Optional[Thread] = None
+
+    def update(self) -> bool:
+        """Start a background save if ``interval`` steps have passed; returns whether one started."""
+        if self.simulation.steps - self.last_step < self.interval or self.busy():
+            return False
+        self.save()
+        return True
+
+    def busy(self) -> bool:
+        if self.child is not None:
+            pid, status = os.waitpid(self.child, os.WNOHANG)
+            if pid == 0:
+                return True
+            self._finished(os.waitstatus_to_exitcode(status) == 0)
+        return self.thread is not None and self.thread.is_alive()
+
+    def save(self) -> None:
+        self.last_step = self.simulation.steps
+        path = os.path.join(self.directory, f'world-{self.simulation.steps:010d}.npz')
+        start = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        if self.fork:
+            self.child = os.fork()
+            if self.child == 0:
+                self._write_in_child(path)
+        else:
+            arrays = checkpoint.snapshot(self.simulation)
+            self.thread = Thread(target=self._write, args=(arrays, path), daemon=True)
+            self.thread.start()
+        self.pause = time.perf_counter() - start
+
+    def _write_in_child(self, path: str) -> None:
+        code = 0
+        try:
+            checkpoint.save(self.simulation, path)
+            self.prune()
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            # Skip the parent's atexit handlers (pygame, worker pools).
+            os._exit(code)
+
+    def _write(self, arrays, path: str) -> None:
+        try:
+            checkpoint.write(arrays, path)
+            self.prune()
+        except Exception:
+            traceback.print_exc()
+            self.failures += 1
+
+    def _finished(self, ok: bool) -> None:
+        self.child = None
+        if not ok:
+            self.failures += 1
+            print(f"autosave to {self.directory} failed", file=sys.stderr)
+
+    def checkpoints(self) -> List[str]:
+        """Saved checkpoints, oldest write first."""
+        paths = glob.glob(os.path.join(self.directory, 'world-*.npz'))
+        return sorted(paths, key=lambda path: (os.stat(path).st_mtime_ns, path))
+
+    def latest(self) -> Optional[str]:
+        paths = self.checkpoints()
+        return paths[-1] if paths else None
+
+    def prune(self) -> None:
+        paths = self.checkpoints()
+        for path in paths[:max(0, len(paths) - self.keep)]:
+            os.remove(path)
+
+    def close(self) -> None:
+        """Wait for a save in progress to finish."""
+        if self.child is not None:
+            _, status = os.waitpid(self.child, 0)
+            self._finished(os.waitstatus_to_exitcode(status) == 0)
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
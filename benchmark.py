@@ -0,0 +1,68 @@
+"""Headless stepping benchmark.
+
+    python benchmark.py --cols 660 --trees 300 --steps 300 --workers 0 1 2 4 8
+    python benchmark.py --cols 4000 --trees 1300 --workers 0 --strips 1 2 4 8
+
+Runs the same seeded world once per worker count (0 is the serial engine)
+and prints steps per second, the speed-up over the first run and whether
+the world ended up identical to it. ``--strips`` also runs the world split
+into column strips (see ``strips.py``); those runs grow differently, so
+only their speed is comparable.
+"""
+import argparse
+import os
+import random
+import time
+
+from engine import Simulation
+from settings import rows
+from strips import StripWorld
+
+
+def run(seed: int, trees: int, steps: int, cols: int, workers: int) -> tuple:
+    random.seed(seed)
+    with Simulation(started_tree=trees, rows=rows, cols=cols, step_mode='two_phase', workers=workers) as simulation:
+        start = time.perf_counter()
+        simulation.step(steps)
+        elapsed = time.perf_counter() - start
+        outcome = (len(simulation.trees), len(simulation.grid), simulation.generation)
+    return outcome, steps / elapsed
+
+
+def run_strips(seed: int, trees: int, steps: int, cols: int, strips: int) -> tuple:
+    with StripWorld(started_tree=trees, strips=strips, cols=cols, seed=seed) as world:
+        start = time.perf_counter()
+        world.step(steps)
+        elapsed = time.perf_counter() - start
+        outcome = (world.trees, world.cells, world.generation)
+    return outcome, steps / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cols', type=int, default=660, help="world width in cells (test_bigger_map uses 660)")
+    parser.add_argument('--trees', type=int, default=300)
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 2, 4, 8])
+    parser.add_argument('--strips', type=int, nargs='*', default=[])
+    args = parser.parse_args()
+
+    print(f"{args.cols}x{rows} world, {args.trees} trees, {args.steps} steps, {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in args.workers:
+        outcome, speed = run(args.seed, args.trees, args.steps, args.cols, workers)
+        if baseline is None:
+            baseline = outcome, speed
+        same = 'same' if outcome == baseline[0] else 'DIFFERENT'
+        print(f"workers={workers}: {speed:8.1f} steps/s  x{speed / baseline[1]:.2f}  "
+              f"{outcome[0]} trees, {outcome[1]} cells, generation {outcome[2]} ({same})")
+
+    for strips in args.strips:
+        outcome, speed = run_strips(args.seed, args.trees, args.steps, args.cols, strips)
+        print(f"strips={strips}: {speed:8.1f} steps/s  x{speed / baseline[1]:.2f}  "
+              f"{outcome[0]} trees, {outcome[1]} cells, generation {outcome[2]}")
+
+
+if __name__ == "__main__":
+    main()
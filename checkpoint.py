@@ -0,0 +1,204 @@
+"""Whole-world checkpoints: every tree, cell and counter in one binary file.
+
+    python checkpoint.py world.npz          # print what a checkpoint holds
+
+The file is an uncompressed ``.npz`` archive. Per-tree and per-cell data
+are stored as flat arrays, cells grouped by tree in ``tree.cells`` order, so
+saving and loading are a handful of bulk array copies plus one pass that
+recreates the ``Tree`` and ``Cell`` objects. Random streams are
+counter-based (see ``rng.py``), so the seed and the placement counter are
+the whole RNG state; a resumed run continues exactly like the original.
+"""
+import json
+import os
+import sys
+from typing import Dict
+
+import numpy as np
+
+from engine import Cell, Genome, Simulation, Tree
+from genome import PackedGenome, GenomeRegistry
+from rng import RandomStreams
+from world import CellGridView, WorldGrid
+
+VERSION = 1
+
+CELL_FIELDS = ('x', 'y', 'state', 'energy', 'last_energy', 'gene', 'order')
+
+
+def snapshot(simulation: Simulation) -> Dict[str, np.ndarray]:
+    """The arrays ``save`` writes, copied out of ``simulation``."""
+    trees = simulation.trees
+    store = simulation.grid.store
+    genomes = {}
+    genome_index = [genomes.setdefault(tree.genome.packed, len(genomes)) for tree in trees]
+    canonical = {}
+    canonical_index = [canonical.setdefault(genome.canonical(), len(canonical)) for genome in genomes]
+    slots = np.array([cell.slot for tree in trees for cell in tree.cells], dtype=np.int64)
+
+    meta = {
+        'version': VERSION,
+        'rows': simulation.rows,
+        'cols': simulation.cols,
+        'top': simulation.top,
+        'step_mode': simulation.step_mode,
+        'generation': simulation.generation,
+        'steps': simulation.steps,
+        'sun_level': simulation.sun_level,
+        'last_tree_id': simulation.last_tree_id,
+        'seed': simulation.seed,
+        'placements': simulation.placements,
+        'ancestry_resets': simulation.ancestry_resets,
+        'allocated': store.allocated,
+    }
+    arrays = {
+        'meta': np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+        'genomes': _table(genomes),
+        'genome_canonical': np.array(canonical_index, dtype=np.int64),
+        'canonical': _table(canonical),
+        'tree_id': np.array([tree.id for tree in trees], dtype=np.int64),
+        'tree_genome': np.array(genome_index, dtype=np.int64),
+        'tree_cells': np.array([len(tree.cells) for tree in trees], dtype=np.int64),
+        'tree_state': np.array([tree.state for tree in trees], dtype=np.int8),
+        'tree_energy': np.array([tree.energy for tree in trees], dtype=np.int64),
+        'tree_getting': np.array([tree.getting_energy for tree in trees], dtype=np.int64),
+        'tree_waste': np.array([tree.waste_energy for tree in trees], dtype=np.int64),
+        'tree_age': np.array([tree.age for tree in trees], dtype=np.int64),
+        'tree_die_age': np.array([tree.die_age for tree in trees], dtype=np.int64),
+        'tree_color': np.array([tree.genome.color for tree in trees], dtype=np.int16).reshape(-1, 3),
+        'tree_ancestral': np.array([tree.genome.ancestral_color for tree in trees], dtype=np.int16).reshape(-1, 3),
+    }
+    for name in CELL_FIELDS:
+        arrays['cell_' + name] = getattr(store, name)[slots]
+    return arrays
+
+
+def _table(genomes) -> np.ndarray:
+    return np.frombuffer(b''.join(genome.data for genome in genomes), dtype=np.uint8).reshape(len(genomes), -1)
+
+
+def save(simulation: Simulation, path: str) -> None:
+    """Write ``simulation`` to ``path``, replacing any earlier file only once the new one is complete."""
+    write(snapshot(simulation), path)
+
+
+def write(arrays: Dict[str, np.ndarray], path: str) -> None:
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temporary, path)
+
+
+def read(path: str) -> Dict:
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    meta = json.loads(arrays.pop('meta').tobytes())
+    if meta['version'] != VERSION:
+        raise ValueError(f"{path}: checkpoint version {meta['version']}, expected {VERSION}")
+    return dict(arrays, meta=meta)
+
+
+def load(path: str, **options) -> Simulation:
+    """A new headless ``Simulation`` resumed from ``path``; ``options`` go to its constructor."""
+    meta = read(path)['meta']
+    simulation = Simulation(rows=meta['rows'], cols=meta['cols'], top=meta['top'],
+                            step_mode=options.pop('step_mode', meta['step_mode']), seed=meta['seed'], **options)
+    return restore(simulation, path)
+
+
+def restore(simulation: Simulation, path: str) -> Simulation:
+    """Replace the world of ``simulation`` (for example the front end's) with the checkpoint at ``path``."""
+    data = read(path)
+    meta = data['meta']
+    if (simulation.rows, simulation.cols) != (meta['rows'], meta['cols']):
+        raise ValueError(f"{path}: world is {meta['cols']}x{meta['rows']}, "
+                         f"simulation is {simulation.cols}x{simulation.rows}")
+    return apply(simulation, data)
+
+
+def apply(simulation: Simulation, data: Dict) -> Simulation:
+    """Replace the world of ``simulation`` with ``data``, arrays as ``snapshot`` makes them and a ``meta`` dict."""
+    meta = data['meta']
+
+    simulation.top = meta['top']
+    simulation.generation = meta['generation']
+    simulation.steps = meta['steps']
+    simulation.sun_level = meta['sun_level']
+    simulation.last_tree_id = meta['last_tree_id']
+    simulation.seed = meta['seed']
+    simulation.rng = RandomStreams(meta['seed'])
+    simulation.placements = meta['placements']
+    simulation.ancestry_resets = meta.get('ancestry_resets', 0)
+    simulation.grid = grid = WorldGrid(simulation.cols, simulation.rows)
+    simulation.genomes = GenomeRegistry()
+    simulation.cell_grid = CellGridView(grid)
+    simulation.sprout_draws = {}
+
+    store = grid.store
+    tree_ids = np.repeat(data['tree_id'], data['tree_cells'])
+    slots = store.extend(dict({name: data['cell_' + name] for name in CELL_FIELDS}, tree=tree_ids)).tolist()
+    store.allocated = meta['allocated']
+
+    # Canonical forms are saved too, so interning does not recompute them.
+    canonical = [PackedGenome(row.tobytes()) for row in data['canonical']]
+    for genome in canonical:
+        genome._canonical = genome
+    packed = []
+    for row, index in zip(data['genomes'], data['genome_canonical'].tolist()):
+        genome = PackedGenome(row.tobytes())
+        genome._canonical = genome if genome == canonical[index] else canonical[index]
+        packed.append(genome)
+    columns = ('tree_id', 'tree_genome', 'tree_cells', 'tree_state', 'tree_energy', 'tree_getting',
+               'tree_waste', 'tree_age', 'tree_die_age', 'tree_color', 'tree_ancestral')
+    states = data['cell_state'].tolist()
+
+    trees = []
+    cells = []
+    start = 0
+    for (tree_id, genome, count, state, energy, getting, waste, age, die_age,
+         color, ancestral) in zip(*(data[name].tolist() for name in columns)):
+        tree = Tree.__new__(Tree)
+        tree.simulation = simulation
+        tree.id = tree_id
+        tree.state = state
+        tree.energy = energy
+        tree.getting_energy = getting
+        tree.waste_energy = waste
+        tree.age = age
+        tree.die_age = die_age
+        tree.genome = Genome.__new__(Genome)
+        tree.genome.tree = tree
+        tree.genome.packed = simulation.genomes.intern(packed[genome])
+        tree.genome.color = tuple(color)
+        tree.genome.ancestral_color = tuple(ancestral)
+
+        tree.cells = []
+        tree.frontier = {}
+        for slot, cell_state in zip(slots[start:start + count], states[start:start + count]):
+            cell = Cell.__new__(Cell)
+            cell.store = store
+            cell.tree = tree
+            cell.slot = slot
+            tree.cells.append(cell)
+            if cell_state == 0:
+                tree.frontier[cell] = None
+        cells.extend(tree.cells)
+        trees.append(tree)
+        start += count
+
+    grid.place(cells)
+    simulation.trees = trees
+    return simulation
+
+
+def describe(path: str) -> str:
+    data = read(path)
+    meta = data['meta']
+    return (f"{path}: {meta['cols']}x{meta['rows']} world at step {meta['steps']}, "
+            f"{len(data['tree_id'])} trees, {len(data['cell_x'])} cells, {len(data['genomes'])} genomes, "
+            f"generation {meta['generation']}, seed {meta['seed']}")
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:]:
+        print(describe(name))
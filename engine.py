@@ -0,0 +1,735 @@
+import random
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from genome import BLOCKED, DIRECTIONS, GenomeRegistry, PackedGenome
+from rng import BIRTH, PLACE, SPROUT, DrawnStream, RandomStreams, Stream, integers
+from settings import rows, cols, menu_height
+from world import CellGridView, ChangeSet, WorldGrid, resolve_claims
+
+
+class Cell:
+    """Lightweight handle on one slot of ``Simulation.grid.store``.
+
+    Position, state, gene and energy live in the store's typed arrays; the
+    object itself only ties a slot to its tree.
+    """
+
+    __slots__ = ('store', 'tree', 'slot')
+
+    def __init__(self, simulation: 'Simulation', tree: 'Tree', x: int, y: int, gene: int = 0) -> None:
+        self.store = simulation.grid.store
+        self.tree = tree
+        self.slot = self.store.allocate(x, y, tree.id, gene)
+
+    @property
+    def simulation(self) -> 'Simulation':
+        return self.tree.simulation
+
+    @property
+    def x(self) -> int:
+        return int(self.store.x[self.slot])
+
+    @property
+    def y(self) -> int:
+        return int(self.store.y[self.slot])
+
+    @property
+    def state(self) -> str:
+        return '1' if self.store.state[self.slot] else '0'
+
+    @state.setter
+    def state(self, value: str) -> None:
+        self.store.state[self.slot] = value == '1'
+
+    @property
+    def energy(self) -> int:
+        return int(self.store.energy[self.slot])
+
+    @energy.setter
+    def energy(self, value: int) -> None:
+        self.store.energy[self.slot] = value
+
+    @property
+    def last_energy(self) -> int:
+        return int(self.store.last_energy[self.slot])
+
+    @last_energy.setter
+    def last_energy(self, value: int) -> None:
+        self.store.last_energy[self.slot] = value
+
+    @property
+    def gen_number(self) -> int:
+        return int(self.store.gene[self.slot])
+
+    @property
+    def gen(self) -> Tuple[int, ...]:
+        return self.tree.genome.packed.gene(self.store.gene[self.slot])
+
+    @property
+    def level(self) -> int:
+        cell_y = self.simulation.rows - self.y - 1
+        return min(cell_y + self.simulation.sun_level, 16)
+
+
+class Genome:
+    def __init__(self, tree: 'Tree', genes: Union[PackedGenome, List[List[int]]] = None, color: Tuple[int, int, int] = None, ancestral_color: Tuple[int, int, int] = None, rng: Stream = random) -> None:
+        self.tree = tree
+        if not isinstance(genes, PackedGenome):
+            genes = PackedGenome.from_genes(genes if genes else [self.generate_gen(i, rng) for i in range(16)])
+        self.packed = tree.simulation.genomes.intern(genes)
+        self.color = color if color is not None else self.generate_color(rng)
+        self.ancestral_color = ancestral_color if ancestral_color else self.color
+
+    @property
+    def genes(self) -> List[List[int]]:
+        return self.packed.genes
+
+    @property
+    def population(self) -> int:
+        """Number of trees in the world that carry this exact genome."""
+        return self.tree.simulation.genomes.count(self.packed)
+
+    def release(self) -> None:
+        self.tree.simulation.genomes.release(self.packed)
+
+    @staticmethod
+    def generate_gen(index: int, rng: Stream = random) -> List[List[int]]:
+        result = []
+        for _ in range(4):
+            num = rng.randint(0, 31)
+            if num <= 15:
+                result.append(num)
+            else:
+                result.append(30)
+
+        if index == 0:
+            count_30 = result.count(30)
+            while count_30 > 2:
+                result[result.index(30)] = rng.randint(0, 15)
+                count_30 -= 1
+
+        return result
+
+    @staticmethod
+    def generate_color(rng: Stream = random) -> Tuple[int, int, int]:
+        return (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+
+
+class Tree:
+    growth_energy = 18
+
+    def __init__(self, simulation: 'Simulation', x: int = None, y: int = None, genome: Union[PackedGenome, List[List[int]]] = None, color_gen: Tuple[int, int, int] = None, die_age: int = None, ancestral_color: Tuple[int, int, int] = None) -> None:
+        self.simulation = simulation
+        self.id = simulation.new_tree_id()
+        self.cells: List[Cell] = []
+        self.frontier: Dict[Cell, None] = {}
+        self.energy: int = 300
+        self.getting_energy = sum([cell.energy for cell in self.cells if cell.state == '1'])
+        self.waste_energy: int = len(self.cells) * 13
+        rng = simulation.rng.stream(BIRTH, self.id) if genome is None or color_gen is None or not die_age else None
+        self.genome = Genome(self, genes=genome, color=color_gen, ancestral_color=ancestral_color, rng=rng)
+        self.age = 0
+        self.die_age = die_age if die_age else rng.randint(88, 92)
+        self.state = 1
+        for log in simulation.grid.changes:
+            log.born.append(self.id)
+
+        self.birth(x, y)
+        self.update_energy()
+
+    def birth(self, x, y) -> None:
+        if x is None or y is None:
+            x, y = self.simulation.free_ground_position()
+        self.add_cell(x, y, 0)
+
+    def add_cell(self, x: int, y: int, gene: int) -> Cell:
+        cell = Cell(simulation=self.simulation, tree=self, x=x, y=y, gene=gene)
+        self.cells.append(cell)
+        self.frontier[cell] = None
+        self.simulation.grid.add(cell)
+        return cell
+
+    def remove_cell(self, cell: Cell) -> None:
+        self.cells.remove(cell)
+        self._drop_cell(cell)
+
+    def _drop_cell(self, cell: Cell) -> None:
+        self.frontier.pop(cell, None)
+        self.simulation.grid.remove(cell)
+
+    def grow(self) -> None:
+        # Only seeds can grow, and new cells join the frontier while we loop.
+        for cell in list(self.frontier):
+            if cell.energy >= self.growth_energy:
+                targets = self.growth_targets(cell)
+                for new_x, new_y, pointer in targets:
+                    self.add_cell(new_x, new_y, pointer)
+                self.settle(cell, grown=bool(targets))
+
+    def growth_targets(self, cell: Cell) -> List[Tuple[int, int, int]]:
+        """Free neighbours ``cell`` would grow into, as (x, y, gene) triples.
+
+        Reads the occupancy grid without changing anything, so it can be
+        evaluated for every seed against one frozen snapshot of the world.
+        """
+        cols = self.simulation.cols
+        occupied = self.simulation.grid.occupied
+        genes = self.genome.packed.data
+        x, y = cell.x, cell.y
+
+        directions = [
+            (x, y - 1),
+            (x - 1, y),
+            (x + 1, y),
+            (x, y + 1)
+        ]
+
+        targets = []
+        gene = cell.gen_number * 4
+        for i, (new_x, new_y) in enumerate(directions):
+            pointer = genes[gene + i]
+            if pointer == BLOCKED:
+                continue
+
+            new_x = cols - 1 if new_x < 0 else 0 if new_x >= cols else new_x
+
+            if self.simulation.top <= new_y < self.simulation.rows and not occupied[new_y, new_x]:
+                targets.append((new_x, new_y, pointer))
+        return targets
+
+    def settle(self, cell: Cell, grown: bool) -> None:
+        """Turn a seed that tried to grow into wood, paying for growth if it did."""
+        if grown:
+            cell.energy -= self.growth_energy
+        for log in self.simulation.grid.changes:
+            log.touch(cell)
+        cell.state = '1'
+        del self.frontier[cell]
+
+    def update_energy(self) -> None:
+        growed_cells = [cell for cell in self.cells if cell.state == '1']
+
+        self.getting_energy = 0
+
+        for cell in growed_cells:
+            self.getting_energy += cell.energy
+            cell.energy = 0
+
+        self.waste_energy = len(self.cells) * 13
+        self.energy += self.getting_energy - self.waste_energy
+
+    def check_death(self) -> None:
+        if self.state == 1:
+            if self.energy <= 0 or self.age >= self.die_age:
+                seeds = list(self.frontier)
+                for cell in self.cells:
+                    if cell.state == '1':
+                        self.simulation.grid.remove(cell)
+                self.cells = seeds
+                self.state = 0
+                for log in self.simulation.grid.changes:
+                    log.died.append(self.id)
+        elif self.state == 0:
+            if len(self.cells) == 0:
+                self.die()
+
+            falling = []
+            for cell in self.cells:
+                if cell.y != self.simulation.rows - 1:
+                    falling.append(cell)
+                else:
+                    rng = self.simulation.sprout_stream(cell)
+                    mutated_genome, mutated = self.mutate(genome=self.genome.packed, energy=self.energy, rng=rng)
+                    die_age = self.mutate_die_age(self.die_age, rng=rng)
+                    if mutated:
+                        self.simulation.generation += 1
+                    self.simulation.sprout(x=cell.x, y=cell.y, genome=mutated_genome,
+                                           color_gen=None if mutated else self.genome.color,
+                                           die_age=die_age, ancestral_color=self.genome.ancestral_color)
+
+                    self._drop_cell(cell)
+            self.cells = falling
+
+    @staticmethod
+    def mutate(genome: PackedGenome, energy, max_energy=500, min_chance=0.1, max_chance=0.3, rng: Stream = random) -> Tuple[PackedGenome, int]:
+        normalized_energy = max(0, min(energy / max_energy, 1))
+        mutation_chance = min_chance + (1 - normalized_energy) * (max_chance - min_chance)
+
+        if rng.random() > mutation_chance:
+            return genome, 0
+
+        gene = rng.randint(0, 15)
+        position = rng.randint(0, 3)
+        value = rng.randint(0, 15)
+
+        return genome.mutated(gene, position, value), 1
+
+    @staticmethod
+    def mutate_die_age(age, chance=0.25, rng: Stream = random) -> int:
+        if rng.random() > chance:
+            return age
+
+        pom = rng.randint(0, 1)
+        if pom == 0:
+            return age + 1
+        else:
+            return age - 1
+
+    def die(self) -> None:
+        for cell in self.cells:
+            self.simulation.grid.remove(cell)
+        self.cells = []
+        self.energy = 0
+        self.age = 0
+        self.simulation.trees.remove(self)
+        self.genome.release()
+        for log in self.simulation.grid.changes:
+            if self.state == 1:
+                log.died.append(self.id)
+            log.cleared.append(self.id)
+
+    def fall_cells(self) -> None:
+        occupied = self.simulation.grid.occupied
+        bottom = self.simulation.rows - 1
+
+        kept = []
+        for cell in self.cells:
+            if cell.y < bottom and not occupied[cell.y + 1, cell.x]:
+                self.simulation.grid.move(cell, cell.x, cell.y + 1)
+                kept.append(cell)
+            elif cell.y == bottom:
+                kept.append(cell)
+            else:
+                self._drop_cell(cell)
+        self.cells = kept
+
+    def check_for_downtime(self) -> None:
+        if len(self.cells) == 1 and self.age >= 5:
+            self.die()
+
+
+# Growth directions in the order a gene lists them: up, left, right, down.
+STEP_X = np.array([0, -1, 1, 0])
+STEP_Y = np.array([-1, 0, 0, 1])
+
+
+def genome_table(trees: Sequence[Tree]) -> np.ndarray:
+    """Packed genomes of ``trees`` as one ``len(trees) x 64`` byte array."""
+    data = b''.join(tree.genome.packed.data for tree in trees)
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(trees), -1)
+
+
+# Words a sprouting seed draws at most: mutation check, gene, position and
+# value, then the die_age check and direction.
+SPROUT_DRAWS = 6
+# Words a random tree draws at most: 4 for gene 0, up to 2 redraws of its
+# blocked directions, 60 for genes 1-15, 3 for the color and 1 for die_age.
+BIRTH_DRAWS = 70
+
+
+def random_genomes(streams: RandomStreams, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Random genomes, colors and lifespans for new trees ``ids``, in bulk.
+
+    Returns ``len(ids) x 64`` packed gene bytes, ``len(ids) x 3`` colors and
+    the die ages: exactly what ``Genome.generate_gen``, ``generate_color`` and
+    ``Tree`` would draw from each tree's birth stream one value at a time.
+    """
+    words = streams.block(streams.keys(BIRTH, ids), BIRTH_DRAWS)
+    rows = np.arange(len(ids))
+
+    first = integers(words[:, :4], 0, 31)
+    first[first > 15] = BLOCKED
+    # Gene 0 keeps at most two blocked directions, redrawing the first ones.
+    redraws = np.maximum((first == BLOCKED).sum(axis=1) - 2, 0)
+    for i in range(2):
+        redraw = redraws > i
+        column = np.argmax(first == BLOCKED, axis=1)
+        first[rows[redraw], column[redraw]] = integers(words[redraw, 4 + i], 0, 15)
+
+    offset = 4 + redraws[:, None]
+    rest = integers(words[rows[:, None], offset + np.arange(60)], 0, 31)
+    rest[rest > 15] = BLOCKED
+    colors = integers(words[rows[:, None], offset + 60 + np.arange(3)], 0, 255)
+    die_ages = integers(words[rows, offset[:, 0] + 63], 88, 92)
+    genomes = np.concatenate([first, rest], axis=1).astype(np.uint8)
+    return genomes, colors, die_ages
+
+
+def owned_cells(store, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Live slots of ``store`` owned by the trees in the sorted ``ids``.
+
+    Returns the slots and, for each, the index of its tree in ``ids``.
+    ``store`` is a ``CellStore`` or anything with the same field arrays.
+    """
+    cells = np.flatnonzero(store.alive)
+    owner = store.tree[cells]
+    index = np.searchsorted(ids, owner)
+    index[index == len(ids)] = 0
+    keep = ids[index] == owner
+    return cells[keep], index[keep]
+
+
+def propose_growth(store, occupied: np.ndarray, ids: np.ndarray, genomes: np.ndarray, top: int,
+                   growth_energy: int, owned: Tuple[np.ndarray, np.ndarray] = None) -> Tuple[np.ndarray, ...]:
+    """Growth proposals of the trees ``ids`` against a frozen occupancy grid.
+
+    Ready seeds are the trees' state 0 cells holding at least
+    ``growth_energy``, ordered by (tree, frontier position). Returns the seed
+    slots, each seed's tree index, and the claims as parallel arrays of seed
+    index, x, y and gene pointer, in (seed, direction) priority order.
+    Nothing is written, so disjoint sets of trees can be proposed in parallel.
+    ``owned`` restricts the work to part of ``owned_cells(store, ids)``.
+    """
+    cells, index = owned_cells(store, ids) if owned is None else owned
+    ready = (store.state[cells] == 0) & (store.energy[cells] >= growth_energy)
+    seeds, index = cells[ready], index[ready]
+    order = np.lexsort((store.order[seeds], index))
+    seeds, index = seeds[order], index[order]
+
+    rows, cols = occupied.shape
+    genes = store.gene[seeds].astype(np.intp)[:, None] * DIRECTIONS + np.arange(DIRECTIONS)
+    pointers = genomes[index[:, None], genes]
+    xs = (store.x[seeds].astype(np.intp)[:, None] + STEP_X) % cols
+    ys = store.y[seeds].astype(np.intp)[:, None] + STEP_Y
+
+    valid = (pointers != BLOCKED) & (ys >= top) & (ys < rows)
+    valid[valid] = ~occupied[ys[valid], xs[valid]]
+    claim, _ = np.nonzero(valid)
+    return seeds, index, claim, xs[valid], ys[valid], pointers[valid]
+
+
+def collect_energy(store, occupied: np.ndarray, ids: np.ndarray, sun_level: int,
+                   owned: Tuple[np.ndarray, np.ndarray] = None) -> Tuple[np.ndarray, ...]:
+    """Photosynthesis for every cell of the trees ``ids``.
+
+    Returns the cells' slots, their new ``energy`` and ``last_energy``, and
+    each tree's income (the energy its wood hands over). Reads only and takes
+    ``owned``, like ``propose_growth``.
+    """
+    cells, index = owned_cells(store, ids) if owned is None else owned
+    xs, ys = store.x[cells], store.y[cells]
+    # Shade is counted only in the columns that hold cells, so a wide world
+    # split between processes costs each of them its own columns.
+    columns, column = np.unique(xs, return_inverse=True)
+    counts = occupied[:, columns].astype(np.int32)
+    upper = np.cumsum(counts, axis=0) - counts
+    level = np.minimum(occupied.shape[0] - ys.astype(np.int32) - 1 + sun_level, 16)
+
+    last_energy = store.energy[cells] + level * np.maximum(3 - upper[ys, column], 0)
+    grown = store.state[cells] == 1
+    getting = np.bincount(index[grown], weights=last_energy[grown], minlength=len(ids)).astype(np.int64)
+    energy = np.where(grown, 0, last_energy)
+    return cells, energy, last_energy, getting
+
+
+class Simulation:
+    """Headless world model: trees, cells and the occupancy grid.
+
+    Nothing here imports pygame or tkinter, so the model can be driven from
+    scripts, worker processes and benchmarks. The windowed front end in
+    ``main.py`` subclasses it and adds rendering and input handling.
+
+    All randomness comes from ``rng``, counter-based streams derived from
+    ``seed`` per tree and per step (see ``rng.py``). Without a seed one is
+    drawn from the global ``random`` module, so ``random.seed`` still pins a
+    run down.
+
+    With ``workers`` > 0 the growth proposals and photosynthesis of each step
+    are split across that many processes (see ``parallel.WorkerPool``). This
+    does not make stepping faster: the rest of the step stays in this process
+    and the pool adds its round trips. Call ``close`` or use the simulation as
+    a context manager to stop the processes.
+    """
+
+    step_modes = ('sequential', 'two_phase')
+    # Below this many candidate seeds a step draws sprout streams one by one.
+    prefetch_threshold = 64
+
+    def __init__(self, started_tree: int = None, rows: int = rows, cols: int = cols, top: int = menu_height,
+                 step_mode: str = None, workers: int = 0, seed: int = None) -> None:
+        if step_mode is None:
+            step_mode = 'two_phase' if workers else 'sequential'
+        if step_mode not in self.step_modes:
+            raise ValueError(f"unknown step mode {step_mode!r}, expected one of {self.step_modes}")
+        if workers and step_mode != 'two_phase':
+            raise ValueError("worker processes need the 'two_phase' step mode")
+
+        self.step_mode = step_mode
+        self.rows = rows
+        self.cols = cols
+        self.top = top
+        self.trees = []
+        self.generation = 0
+        self.steps = 0
+        self.sun_level = 6
+        self.grid = WorldGrid(cols, rows)
+        self.genomes = GenomeRegistry()
+        self.cell_grid = CellGridView(self.grid)
+        self.check_grid = False
+        self.last_tree_id = -1
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.rng = RandomStreams(self.seed)
+        self.placements = 0
+        self.sprout_draws: Dict[int, Tuple[int, List[int]]] = {}
+        self.ancestry_resets = 0
+        self.recorders = []
+        self.pool = None
+        if workers:
+            from parallel import WorkerPool
+            self.pool = WorkerPool(workers)
+
+        if started_tree:
+            self.add_trees(started_tree)
+
+    @property
+    def occupied_positions(self) -> WorldGrid:
+        return self.grid
+
+    def new_tree_id(self) -> int:
+        self.last_tree_id += 1
+        return self.last_tree_id
+
+    def update_cell_grid(self):
+        self.grid.rebuild(self.trees)
+
+    def verify_cell_grid(self) -> None:
+        """Compare the incremental grid with a full rebuild and fail loudly on drift."""
+        mismatched = self.grid.check(self.trees)
+        if mismatched:
+            raise RuntimeError(f"cell grid out of sync at {len(mismatched)} positions, e.g. {mismatched[:5]}")
+
+    def free_ground_position(self) -> Optional[Tuple[int, int]]:
+        y = self.rows - 1
+        free = (np.flatnonzero(~self.grid.occupied[y, 5:]) + 5).tolist()
+        if not free:
+            return None
+        self.placements += 1
+        return self.rng.stream(PLACE, self.placements).choice(free), y
+
+    def add_trees(self, count: int, positions: List[Tuple[int, int]] = None) -> List[Tree]:
+        """Add ``count`` random trees at once, on free ground or at ``positions``.
+
+        Gives the same trees as calling ``add_tree`` ``count`` times, but
+        draws all placements, genomes, colors and lifespans in bulk (see
+        ``random_genomes``), so large starting populations do not spend their
+        time in the random number generator.
+        """
+        if positions is None:
+            y = self.rows - 1
+            free = (np.flatnonzero(~self.grid.occupied[y, 5:]) + 5).tolist()
+            count = min(count, len(free))
+            keys = self.rng.keys(PLACE, np.arange(self.placements + 1, self.placements + count + 1))
+            picks = integers(self.rng.block(keys, 1)[:, 0], 0, 0xFFFFFFFF).tolist()
+            positions = [(free.pop((pick * (len(free))) >> 32), y) for pick in picks]
+            self.placements += count
+
+        ids = np.arange(self.last_tree_id + 1, self.last_tree_id + len(positions) + 1)
+        genomes, colors, die_ages = random_genomes(self.rng, ids)
+        trees = []
+        for (x, y), genes, color, die_age in zip(positions, genomes, colors.tolist(), die_ages.tolist()):
+            trees.append(Tree(simulation=self, x=x, y=y, genome=PackedGenome(genes.tobytes()),
+                              color_gen=tuple(color), die_age=die_age))
+        self.trees.extend(trees)
+        return trees
+
+    def add_tree(self, genome: List[Tuple[int, int, int]] = None, x: int = None, y: int = None) -> Optional['Tree']:
+        if x is None or y is None:
+            position = self.free_ground_position()
+            if position is None:
+                return None
+            x, y = position
+
+        tree = Tree(simulation=self, genome=genome[:-1] if genome else None,
+                    color_gen=genome[-1] if genome and len(genome) == 17 else None, x=x, y=y)
+        self.trees.append(tree)
+        return tree
+
+    def check_for_ancestral(self):
+        if len(self.trees) <= 1:
+            return
+
+        if len({tree.genome.ancestral_color for tree in self.trees}) == 1:
+            for tree in self.trees:
+                tree.genome.ancestral_color = tree.genome.color
+            self.ancestry_resets += 1
+
+    def begin_step(self) -> Tuple[List[Tuple[Tree, int]], List[Tree]]:
+        """Age the living trees; returns every tree with its state and the living ones."""
+        self.check_for_ancestral()
+        trees = [(tree, tree.state) for tree in self.trees]
+        living = [tree for tree, state in trees if state == 1]
+        for tree in living:
+            tree.age += 1
+        return trees, living
+
+    def finish_step(self, trees: List[Tuple[Tree, int]]) -> None:
+        """Death, reproduction and falling for the trees ``begin_step`` returned."""
+        self.prefetch_sprouts([tree for tree, state in trees if state == 0])
+        for tree, state in trees:
+            if state == 1:
+                tree.check_death()
+                tree.check_for_downtime()
+            else:
+                tree.fall_cells()
+                tree.check_death()
+
+    def prefetch_sprouts(self, trees: List[Tree]) -> None:
+        """Pre-draw the mutation words of every seed that could sprout this step.
+
+        Only seeds of dead trees sprout, so their streams are known before the
+        lifecycle runs; ``sprout_stream`` then serves them from the block.
+        """
+        slots = [cell.slot for tree in trees for cell in tree.cells]
+        self.sprout_draws = {}
+        if len(slots) < self.prefetch_threshold:
+            return
+
+        owners = [tree.id for tree in trees for _ in tree.cells]
+        keys = self.rng.keys(SPROUT, np.array(owners), self.steps, self.grid.store.order[slots])
+        words = self.rng.block(keys, SPROUT_DRAWS).tolist()
+        self.sprout_draws = dict(zip(slots, zip(keys.tolist(), words)))
+
+    def sprout_stream(self, cell: Cell) -> Stream:
+        """The random stream for ``cell`` sprouting on this step."""
+        drawn = self.sprout_draws.get(cell.slot)
+        if drawn is not None:
+            return DrawnStream(*drawn)
+        return self.rng.stream(SPROUT, cell.tree.id, self.steps, int(cell.store.order[cell.slot]))
+
+    def update_energy(self, trees: List[Tree]) -> None:
+        """Photosynthesis for every cell of ``trees`` in one vectorized pass.
+
+        Every cell gains its ``level`` times the light left after the cells
+        above it (three or more shade it fully). Wood hands all its energy to
+        the tree, which then pays 13 per cell. Works on the cell store arrays
+        (see ``collect_energy``) and reduces the per-tree income with a
+        grouped sum.
+        """
+        if not trees:
+            return
+
+        store = self.grid.store
+        trees = sorted(trees, key=lambda tree: tree.id)
+        ids = np.array([tree.id for tree in trees], dtype=np.int32)
+        if self.pool:
+            self.pool.adopt(self.grid)
+        collect = self.pool.collect_energy if self.pool else collect_energy
+        cells, energy, last_energy, getting = collect(store, self.grid.occupied, ids, self.sun_level)
+        store.energy[cells] = energy
+        store.last_energy[cells] = last_energy
+
+        for tree, getting_energy in zip(trees, getting.tolist()):
+            tree.getting_energy = getting_energy
+            tree.waste_energy = len(tree.cells) * 13
+            tree.energy += tree.getting_energy - tree.waste_energy
+
+    def grow(self, trees: List[Tree]) -> None:
+        """Grow all ``trees`` in two batched phases.
+
+        First every ready seed proposes its targets against the occupancy as
+        it stands, without changing the world (see ``propose_growth``). Then
+        contested positions go to the claim with the lowest (tree id, frontier
+        position, direction), in one vectorized pass, and the winners are
+        applied. The outcome does not depend on the order of ``trees``.
+        """
+        if not trees:
+            return
+
+        proposals = self.propose(trees)
+        xs, ys = proposals[3], proposals[4]
+        self.apply_growth(proposals, resolve_claims(ys * self.cols + xs))
+
+    def propose(self, trees: List[Tree]) -> Tuple[np.ndarray, ...]:
+        """``propose_growth`` for ``trees``, run by the worker pool if there is one."""
+        grid = self.grid
+        trees = sorted(trees, key=lambda tree: tree.id)
+        ids = np.array([tree.id for tree in trees], dtype=np.int32)
+        if self.pool:
+            self.pool.adopt(grid)
+        propose = self.pool.propose_growth if self.pool else propose_growth
+        return propose(grid.store, grid.occupied, ids, genome_table(trees), self.top, Tree.growth_energy)
+
+    def apply_growth(self, proposals: Tuple[np.ndarray, ...], winners: np.ndarray) -> None:
+        """Add the winning claims of ``proposals`` and settle every proposing seed."""
+        grid = self.grid
+        seeds, _, claim, xs, ys, pointers = proposals
+        seed_cells = grid.cells[grid.store.y[seeds], grid.store.x[seeds]].tolist()
+        grown = [False] * len(seeds)
+        for seed, x, y, pointer in zip(claim[winners].tolist(), xs[winners].tolist(),
+                                       ys[winners].tolist(), pointers[winners].tolist()):
+            seed_cells[seed].tree.add_cell(x, y, pointer)
+            grown[seed] = True
+
+        for cell, seed_grown in zip(seed_cells, grown):
+            cell.tree.settle(cell, grown=seed_grown)
+
+    def sprout(self, **tree) -> Tree:
+        """Start a seedling from a seed that reached the ground; ``tree`` holds ``Tree`` arguments."""
+        seedling = Tree(simulation=self, **tree)
+        self.trees.append(seedling)
+        return seedling
+
+    def close(self) -> None:
+        """Stop the worker processes, if any, and free their shared memory."""
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+
+    def __enter__(self) -> 'Simulation':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def step(self, n: int = 1) -> None:
+        """Advance the world by ``n`` steps without rendering.
+
+        Living trees first grow, one after another or, with the 'two_phase'
+        step mode, through batched proposals (see ``grow``). Then all of them
+        collect energy in a single batched pass, and finally every tree that
+        existed at the start of the step checks for death, reproduction and
+        falling.
+        """
+        for _ in range(n):
+            trees, living = self.begin_step()
+
+            if self.step_mode == 'two_phase':
+                self.grow(living)
+            else:
+                for tree in living:
+                    tree.grow()
+
+            self.update_energy(living)
+            self.finish_step(trees)
+
+            self.steps += 1
+
+            for recorder in self.recorders:
+                recorder.record()
+
+            if self.check_grid:
+                self.verify_cell_grid()
+
+    def iter_steps(self, n: int = None) -> Iterator[ChangeSet]:
+        """Step the world ``n`` times, or for as long as the caller asks, yielding each step's ``ChangeSet``.
+
+        Changes made between steps, for example by ``add_tree``, are reported
+        with the next step. Replacing the world, as loading a checkpoint or
+        rewinding does, is not a step and is not reported.
+        """
+        count = 0
+        grid = self.grid
+        log = grid.subscribe()
+        try:
+            while n is None or count < n:
+                if self.grid is not grid:
+                    grid.unsubscribe(log)
+                    grid = self.grid
+                    log = grid.subscribe()
+                self.step()
+                count += 1
+                yield log.collect(self.steps)
+        finally:
+            grid.unsubscribe(log)
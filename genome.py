@@ -0,0 +1,214 @@
+from collections import defaultdict, deque
+import hashlib
+import os
+import sys
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+GENES = 16
+DIRECTIONS = 4
+BLOCKED = 30
+
+
+class PackedGenome:
+    """Immutable 16 x 4 gene table packed into 64 bytes.
+
+    Each byte is a gene pointer (0-15) or ``BLOCKED``. Offspring that are not
+    mutated share their parent's object, and ``mutated`` returns a new one.
+    Lookups go by gene index: ``pointer(gene, direction)`` is a single byte
+    read.
+    """
+
+    __slots__ = ('data', '_hash', '_canonical')
+
+    def __init__(self, data: bytes) -> None:
+        if len(data) != GENES * DIRECTIONS:
+            raise ValueError(f"packed genome must be {GENES * DIRECTIONS} bytes, got {len(data)}")
+        self.data = bytes(data)
+        self._hash = hash(self.data)
+        self._canonical = None
+
+    @classmethod
+    def from_genes(cls, genes: Sequence[Sequence[int]]) -> 'PackedGenome':
+        if len(genes) != GENES or any(len(gene) != DIRECTIONS for gene in genes):
+            raise ValueError(f"genome must have {GENES} genes of {DIRECTIONS} values")
+        return cls(bytes(value for gene in genes for value in gene))
+
+    @property
+    def genes(self) -> List[List[int]]:
+        """The table as fresh lists, in the layout ``save_genome`` writes."""
+        data = self.data
+        return [list(data[i:i + DIRECTIONS]) for i in range(0, len(data), DIRECTIONS)]
+
+    def gene(self, index: int) -> Tuple[int, ...]:
+        start = index * DIRECTIONS
+        return tuple(self.data[start:start + DIRECTIONS])
+
+    def pointer(self, index: int, direction: int) -> int:
+        return self.data[index * DIRECTIONS + direction]
+
+    def mutated(self, index: int, direction: int, value: int) -> 'PackedGenome':
+        data = bytearray(self.data)
+        data[index * DIRECTIONS + direction] = value
+        return PackedGenome(bytes(data))
+
+    def reachable(self) -> List[int]:
+        """Genes that growth can express, in breadth-first order from gene 0."""
+        data = self.data
+        order = [0]
+        seen = {0}
+        queue = deque(order)
+        while queue:
+            start = queue.popleft() * DIRECTIONS
+            for pointer in data[start:start + DIRECTIONS]:
+                if pointer != BLOCKED and pointer not in seen:
+                    seen.add(pointer)
+                    order.append(pointer)
+                    queue.append(pointer)
+        return order
+
+    def canonical(self) -> 'PackedGenome':
+        """Normal form that grows the same tree.
+
+        Unreachable genes are cleared to ``BLOCKED`` and reachable ones are
+        renumbered in the order ``reachable`` visits them, so genomes that
+        differ only in genes growth never reads share one canonical form.
+        Mutation can still expose unreachable genes, so the canonical form
+        describes the phenotype, not the lineage's future.
+        """
+        if self._canonical is None:
+            order = self.reachable()
+            renumber = {gene: i for i, gene in enumerate(order)}
+            renumber[BLOCKED] = BLOCKED
+            data = bytearray([BLOCKED]) * len(self.data)
+            for gene in order:
+                start = renumber[gene] * DIRECTIONS
+                source = gene * DIRECTIONS
+                data[start:start + DIRECTIONS] = bytes(renumber[pointer] for pointer in self.data[source:source + DIRECTIONS])
+
+            canonical = PackedGenome(bytes(data))
+            self._canonical = self if canonical == self else canonical
+            canonical._canonical = canonical
+        return self._canonical
+
+    def canonical_hash(self) -> str:
+        """Hex digest of the canonical form, stable across runs and processes."""
+        return hashlib.blake2b(self.canonical().data, digest_size=8).hexdigest()
+
+    def __iter__(self) -> Iterable[Tuple[int, ...]]:
+        return (self.gene(i) for i in range(GENES))
+
+    def __len__(self) -> int:
+        return GENES
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PackedGenome) and self.data == other.data
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"PackedGenome({self.data.hex()})"
+
+
+class RegistryEntry:
+    __slots__ = ('genome', 'canonical', 'count')
+
+    def __init__(self, genome: PackedGenome) -> None:
+        self.genome = genome
+        self.canonical = genome.canonical()
+        self.count = 0
+
+
+class GenomeRegistry:
+    """Content-addressed table of the genomes carried by trees in the world.
+
+    ``intern`` hands out one shared ``PackedGenome`` per distinct gene table
+    and counts its holders; ``release`` drops the entry once the last holder
+    is gone. Population counts are therefore a dict lookup, both per exact
+    genome and per canonical form (trees that grow the same way).
+    """
+
+    def __init__(self) -> None:
+        self.entries: Dict[PackedGenome, RegistryEntry] = {}
+        self.phenotypes: Dict[PackedGenome, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, genome: PackedGenome) -> bool:
+        return genome in self.entries
+
+    def intern(self, genome: PackedGenome) -> PackedGenome:
+        entry = self.entries.get(genome)
+        if entry is None:
+            entry = self.entries[genome] = RegistryEntry(genome)
+        entry.count += 1
+        self.phenotypes[entry.canonical] = self.phenotypes.get(entry.canonical, 0) + 1
+        return entry.genome
+
+    def release(self, genome: PackedGenome) -> None:
+        entry = self.entries[genome]
+        entry.count -= 1
+        if entry.count == 0:
+            del self.entries[genome]
+
+        self.phenotypes[entry.canonical] -= 1
+        if self.phenotypes[entry.canonical] == 0:
+            del self.phenotypes[entry.canonical]
+
+    def count(self, genome: PackedGenome) -> int:
+        entry = self.entries.get(genome)
+        return entry.count if entry else 0
+
+    def count_canonical(self, genome: PackedGenome) -> int:
+        return self.phenotypes.get(genome.canonical(), 0)
+
+    def diversity(self) -> Tuple[int, int]:
+        """Number of distinct genomes and of distinct canonical forms."""
+        return len(self.entries), len(self.phenotypes)
+
+    def most_common(self, n: int = None) -> List[Tuple[PackedGenome, int]]:
+        counts = sorted(((entry.genome, entry.count) for entry in self.entries.values()),
+                        key=lambda item: item[1], reverse=True)
+        return counts if n is None else counts[:n]
+
+
+def parse_genome(text: str) -> List[Sequence[int]]:
+    """Parse the save format: 16 gene lines and an optional color line."""
+    return [list(map(int, line.strip().split(','))) if i != 16
+            else tuple(map(int, line.strip().split(',')))
+            for i, line in enumerate(text.splitlines())]
+
+
+def format_genome(genes: Iterable[Sequence[int]], color: Sequence[int]) -> str:
+    lines = [','.join(map(str, gene)) for gene in genes]
+    lines.append(','.join(map(str, color)))
+    return '\n'.join(lines) + '\n'
+
+
+def read_genome(path: str) -> List[Sequence[int]]:
+    """Read a genome saved by the front end."""
+    with open(path, 'r') as f:
+        return parse_genome(f.read())
+
+
+def write_genome(path: str, genes: Iterable[Sequence[int]], color: Sequence[int]) -> None:
+    with open(path, 'w') as f:
+        f.write(format_genome(genes, color))
+
+
+def find_duplicate_saves(directory: str = 'saves') -> List[List[str]]:
+    """Group saved genomes that grow identical trees, by canonical hash."""
+    groups = defaultdict(list)
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.endswith('.txt') or not os.path.isfile(path):
+            continue
+        genome = PackedGenome.from_genes(read_genome(path)[:GENES])
+        groups[genome.canonical_hash()].append(path)
+    return [paths for paths in groups.values() if len(paths) > 1]
+
+
+if __name__ == "__main__":
+    for paths in find_duplicate_saves(sys.argv[1] if len(sys.argv) > 1 else 'saves'):
+        print(' = '.join(paths))
@@ -0,0 +1,246 @@
+"""Rewind history: the recent past of a running simulation, kept in memory.
+
+Every ``keyframe_every`` steps the whole world is kept as a keyframe; the
+steps in between are stored as deltas against the step before, listing
+only the trees and cells that appeared, disappeared or changed. Trees are
+identified by id and cells by their allocation number (``CellStore.order``).
+The engine keeps trees in id order and each tree's cells in allocation
+order, so a state rebuilt from a keyframe and its deltas can be handed to
+``checkpoint.apply`` and the run continues from there exactly as it did
+the first time.
+
+When the history outgrows its ``budget`` in bytes, the oldest keyframe is
+dropped together with its deltas, and so are the genomes only they used.
+"""
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+import checkpoint
+from engine import Simulation
+from genome import PackedGenome
+from world import CellStore
+
+TREE = np.dtype([
+    ('id', '<i8'),
+    ('state', 'i1'),
+    ('energy', '<i8'),
+    ('getting', '<i8'),
+    ('waste', '<i8'),
+    ('age', '<i8'),
+    ('die_age', '<i8'),
+    ('genome', '<i4'),        # index into History.genomes
+    ('color', 'u1', 3),
+    ('ancestral', 'u1', 3),
+])
+CELL = np.dtype([(name, dtype) for name, dtype in CellStore.fields if name != 'alive'])
+
+# Memory held per distinct genome: the packed bytes, the object and its index entries.
+GENOME_NBYTES = 320
+
+META = ('top', 'generation', 'steps', 'sun_level', 'last_tree_id', 'placements', 'ancestry_resets')
+
+
+class State(NamedTuple):
+    meta: Dict[str, int]
+    trees: np.ndarray
+    cells: np.ndarray
+
+
+class Delta(NamedTuple):
+    meta: Dict[str, int]
+    trees: np.ndarray         # new and changed trees
+    dead_trees: np.ndarray    # ids
+    cells: np.ndarray         # new and changed cells
+    dead_cells: np.ndarray    # allocation numbers
+
+    @property
+    def nbytes(self) -> int:
+        return self.trees.nbytes + self.dead_trees.nbytes + self.cells.nbytes + self.dead_cells.nbytes
+
+
+class Segment:
+    """A keyframe and the deltas of the steps after it, one per step."""
+
+    def __init__(self, keyframe: State) -> None:
+        self.keyframe = keyframe
+        self.start = keyframe.meta['steps']
+        self.deltas: List[Delta] = []
+        self.nbytes = keyframe.trees.nbytes + keyframe.cells.nbytes
+
+    def state(self, steps: int) -> State:
+        state = self.keyframe
+        for delta in self.deltas[:steps - self.start]:
+            state = apply_delta(state, delta)
+        return state
+
+
+def diff(old: np.ndarray, new: np.ndarray, key: str) -> Tuple[np.ndarray, np.ndarray]:
+    """The rows of ``new`` missing from ``old`` or changed since, and the keys of rows ``new`` lost.
+
+    Both arrays are sorted by ``key``.
+    """
+    if not len(old) or not len(new):
+        return new, old[key]
+    position = np.minimum(np.searchsorted(old[key], new[key]), len(old) - 1)
+    found = old[key][position] == new[key]
+    changed = ~found
+    changed[found] = (_bytes(old[position[found]]) != _bytes(new[found])).any(axis=1)
+    position = np.minimum(np.searchsorted(new[key], old[key]), len(new) - 1)
+    return new[changed], old[key][new[key][position] != old[key]]
+
+
+def _bytes(rows: np.ndarray) -> np.ndarray:
+    return rows.view(np.uint8).reshape(len(rows), -1)
+
+
+def merge(old: np.ndarray, changed: np.ndarray, removed: np.ndarray, key: str) -> np.ndarray:
+    keep = ~np.isin(old[key], removed) & ~np.isin(old[key], changed[key])
+    merged = np.concatenate([old[keep], changed])
+    return merged[np.argsort(merged[key], kind='stable')]
+
+
+def apply_delta(state: State, delta: Delta) -> State:
+    return State(delta.meta, merge(state.trees, delta.trees, delta.dead_trees, 'id'),
+                 merge(state.cells, delta.cells, delta.dead_cells, 'order'))
+
+
+class History:
+    """Keyframes plus per-step deltas of ``simulation``, for rewinding a live run.
+
+    The history hooks itself into ``simulation.step`` and records the state
+    it was started on. ``rewind(step)`` puts the simulation back to the end
+    of any recorded step and forgets the steps after it, so stepping again
+    records the new future. If the simulation jumps between steps in some
+    other way, for example by loading a checkpoint, the history starts over.
+    """
+
+    def __init__(self, simulation: Simulation, keyframe_every: int = 100, budget: int = 64 << 20) -> None:
+        self.simulation = simulation
+        self.keyframe_every = keyframe_every
+        self.budget = budget
+        self.genomes: List[PackedGenome] = []
+        self.genome_index: Dict[PackedGenome, int] = {}
+        self.segments: List[Segment] = []
+        self.state = None
+        simulation.recorders.append(self)
+        self.record()
+
+    @property
+    def first_step(self) -> int:
+        return self.segments[0].start
+
+    @property
+    def last_step(self) -> int:
+        return self.state.meta['steps']
+
+    @property
+    def nbytes(self) -> int:
+        return sum(segment.nbytes for segment in self.segments) + len(self.genomes) * GENOME_NBYTES
+
+    def capture(self) -> State:
+        simulation = self.simulation
+        meta = {name: getattr(simulation, name) for name in META}
+        meta['allocated'] = simulation.grid.store.allocated
+
+        table = np.array([(tree.id, tree.state, tree.energy, tree.getting_energy, tree.waste_energy, tree.age,
+                           tree.die_age, self.intern(tree.genome.packed), tree.genome.color,
+                           tree.genome.ancestral_color) for tree in simulation.trees], dtype=TREE)
+
+        store = simulation.grid.store
+        live = store.live()
+        live = live[np.argsort(store.order[live])]
+        cells = np.zeros(len(live), CELL)
+        for name in CELL.names:
+            cells[name] = getattr(store, name)[live]
+        return State(meta, table, cells)
+
+    def intern(self, genome: PackedGenome) -> int:
+        index = self.genome_index.get(genome)
+        if index is None:
+            index = self.genome_index[genome] = len(self.genomes)
+            self.genomes.append(genome)
+        return index
+
+    def record(self) -> None:
+        state = self.capture()
+        steps = state.meta['steps']
+        if self.state is None or steps != self.last_step + 1:
+            self.segments = [Segment(state)]
+        elif steps - self.segments[-1].start >= self.keyframe_every:
+            self.segments.append(Segment(state))
+        else:
+            trees, dead_trees = diff(self.state.trees, state.trees, 'id')
+            cells, dead_cells = diff(self.state.cells, state.cells, 'order')
+            delta = Delta(state.meta, trees, dead_trees, cells, dead_cells)
+            self.segments[-1].deltas.append(delta)
+            self.segments[-1].nbytes += delta.nbytes
+        self.state = state
+
+        while len(self.segments) > 1 and self.nbytes > self.budget:
+            del self.segments[0]
+            self.prune_genomes()
+
+    def prune_genomes(self) -> None:
+        """Forget the genomes no kept tree table refers to and renumber the rest."""
+        tables = {id(self.state.trees): self.state.trees}
+        for segment in self.segments:
+            tables[id(segment.keyframe.trees)] = segment.keyframe.trees
+            for delta in segment.deltas:
+                tables[id(delta.trees)] = delta.trees
+        used = np.unique(np.concatenate([table['genome'] for table in tables.values()]))
+        renumber = np.zeros(len(self.genomes), dtype=np.int32)
+        renumber[used] = np.arange(len(used), dtype=np.int32)
+        for table in tables.values():
+            table['genome'] = renumber[table['genome']]
+        self.genomes = [self.genomes[index] for index in used.tolist()]
+        self.genome_index = {genome: index for index, genome in enumerate(self.genomes)}
+
+    def rewind(self, steps: int) -> None:
+        """Put the simulation back to how it was after step ``steps``."""
+        if not self.first_step <= steps <= self.last_step:
+            raise ValueError(f"step {steps} is not in the history, which covers steps "
+                             f"{self.first_step} to {self.last_step}")
+        index = max(i for i, segment in enumerate(self.segments) if segment.start <= steps)
+        del self.segments[index + 1:]
+        segment = self.segments[index]
+        del segment.deltas[steps - segment.start:]
+        segment.nbytes = (segment.keyframe.trees.nbytes + segment.keyframe.cells.nbytes
+                          + sum(delta.nbytes for delta in segment.deltas))
+        self.state = segment.state(steps)
+
+        checkpoint.apply(self.simulation, self.arrays(self.state))
+
+    def arrays(self, state: State) -> Dict:
+        """``state`` in the form ``checkpoint.snapshot`` gives."""
+        trees, cells = state.trees, state.cells
+        cells = cells[np.lexsort((cells['order'], cells['tree']))]
+        used, tree_genome = np.unique(trees['genome'], return_inverse=True)
+        genomes = [self.genomes[index] for index in used.tolist()]
+        canonical = {}
+        canonical_index = [canonical.setdefault(genome.canonical(), len(canonical)) for genome in genomes]
+
+        data = {
+            'meta': dict(state.meta, seed=self.simulation.seed),
+            'genomes': checkpoint._table(genomes),
+            'genome_canonical': np.array(canonical_index, dtype=np.int64),
+            'canonical': checkpoint._table(canonical),
+            'tree_id': trees['id'],
+            'tree_genome': tree_genome,
+            'tree_cells': np.bincount(np.searchsorted(trees['id'], cells['tree']), minlength=len(trees)),
+            'tree_state': trees['state'],
+            'tree_energy': trees['energy'],
+            'tree_getting': trees['getting'],
+            'tree_waste': trees['waste'],
+            'tree_age': trees['age'],
+            'tree_die_age': trees['die_age'],
+            'tree_color': trees['color'],
+            'tree_ancestral': trees['ancestral'],
+        }
+        for name in checkpoint.CELL_FIELDS:
+            data['cell_' + name] = cells[name]
+        return data
+
+    def close(self) -> None:
+        if self in self.simulation.recorders:
+            self.simulation.recorders.remove(self)
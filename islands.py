@@ -0,0 +1,194 @@
+"""Island-model evolution: independent worlds in processes that trade genomes.
+
+    python islands.py --islands 4 --steps 20000 --interval 500 --migrants 2 --topology ring
+"""
+import argparse
+import multiprocessing
+import random
+from typing import Callable, Dict, Iterator, List
+
+from engine import Simulation
+from genome import format_genome, parse_genome
+
+
+def ring(index: int, islands: int, rng: random.Random) -> List[int]:
+    return [(index + 1) % islands]
+
+
+def random_neighbour(index: int, islands: int, rng: random.Random) -> List[int]:
+    return [rng.choice([i for i in range(islands) if i != index])]
+
+
+def complete(index: int, islands: int, rng: random.Random) -> List[int]:
+    return [i for i in range(islands) if i != index]
+
+
+# Where an island's migrants go: ``topology(index, islands, rng)`` returns
+# the destination islands, which share the migrants in turn.
+TOPOLOGIES: Dict[str, Callable[[int, int, random.Random], List[int]]] = {
+    'ring': ring,
+    'random': random_neighbour,
+    'complete': complete,
+}
+
+
+class Island:
+    """One world of the archipelago, living in a worker process."""
+
+    def __init__(self, index: int, started_tree: int, seed: int, world: Dict) -> None:
+        random.seed(seed)
+        self.index = index
+        self.simulation = Simulation(started_tree=started_tree, **world)
+        self.immigrants = 0
+
+    def evolve(self, steps: int, report_every: int, reports) -> None:
+        while steps > 0:
+            chunk = min(report_every, steps)
+            self.simulation.step(chunk)
+            steps -= chunk
+            reports.put(('stats', self.stats()))
+
+    def emigrants(self, count: int) -> List[str]:
+        """A random sample of the living trees' genomes, in the save_genome text format."""
+        living = [tree for tree in self.simulation.trees if tree.state == 1]
+        chosen = random.sample(living, min(count, len(living)))
+        return [format_genome(tree.genome.genes, tree.genome.color) for tree in chosen]
+
+    def immigrate(self, genomes: List[str]) -> None:
+        for text in genomes:
+            if self.simulation.add_tree(genome=parse_genome(text)) is not None:
+                self.immigrants += 1
+
+    def stats(self) -> Dict:
+        simulation = self.simulation
+        genomes, phenotypes = simulation.genomes.diversity()
+        return {
+            'island': self.index,
+            'steps': simulation.steps,
+            'trees': len(simulation.trees),
+            'cells': len(simulation.grid),
+            'generation': simulation.generation,
+            'genomes': genomes,
+            'phenotypes': phenotypes,
+            'immigrants': self.immigrants,
+        }
+
+
+def _island_worker(connection, reports, index: int, started_tree: int, seed: int, world: Dict) -> None:
+    island = Island(index, started_tree, seed, world)
+    while True:
+        command, args = connection.recv()
+        if command == 'epoch':
+            genomes, steps, report_every, migrants = args
+            island.immigrate(genomes)
+            island.evolve(steps, report_every, reports)
+            reports.put(('migrants', (index, island.emigrants(migrants))))
+        elif command == 'close':
+            connection.close()
+            return
+
+
+class Archipelago:
+    """Coordinator for ``islands`` worlds that evolve in parallel.
+
+    Islands run ``interval`` steps on their own, then each sends
+    ``migrants`` genomes, as the text ``save_genome`` writes, to the islands
+    ``topology`` names. Migrants are planted at the start of the next
+    interval like genomes loaded from a file. ``run`` yields every island's
+    stats as they arrive, every ``report_every`` steps.
+    """
+
+    def __init__(self, islands: int = 4, started_tree: int = 40, interval: int = 500, migrants: int = 2,
+                 topology: str = 'ring', report_every: int = 100, seed: int = None, **world) -> None:
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"unknown topology {topology!r}, expected one of {tuple(TOPOLOGIES)}")
+        if islands < 2 and migrants:
+            raise ValueError("migration needs at least two islands")
+
+        self.islands = islands
+        self.interval = interval
+        self.migrants = migrants
+        self.topology = TOPOLOGIES[topology]
+        self.report_every = report_every
+        self.random = random.Random(seed)
+        self.stats: List[Dict] = [{} for _ in range(islands)]
+        self.arriving: List[List[str]] = [[] for _ in range(islands)]
+
+        context = multiprocessing.get_context('spawn')
+        self.reports = context.Queue()
+        self.connections = []
+        self.processes = []
+        for index in range(islands):
+            parent, child = context.Pipe()
+            process = context.Process(target=_island_worker, daemon=True,
+                                      args=(child, self.reports, index, started_tree,
+                                            self.random.getrandbits(64), world))
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def run(self, steps: int) -> Iterator[Dict]:
+        """Evolve every island by ``steps``, yielding stats as islands report them."""
+        while steps > 0:
+            epoch = min(self.interval, steps)
+            steps -= epoch
+            for connection, arriving in zip(self.connections, self.arriving):
+                connection.send(('epoch', (arriving, epoch, self.report_every, self.migrants if steps else 0)))
+
+            self.arriving = [[] for _ in range(self.islands)]
+            emigrants = {}
+            while len(emigrants) < self.islands:
+                kind, payload = self.reports.get()
+                if kind == 'stats':
+                    self.stats[payload['island']] = payload
+                    yield payload
+                else:
+                    index, genomes = payload
+                    emigrants[index] = genomes
+
+            self.migrate(emigrants)
+
+    def migrate(self, emigrants: Dict[int, List[str]]) -> None:
+        for index in range(self.islands):
+            destinations = self.topology(index, self.islands, self.random)
+            for i, genome in enumerate(emigrants[index]):
+                self.arriving[destinations[i % len(destinations)]].append(genome)
+
+    def close(self) -> None:
+        for connection in self.connections:
+            connection.send(('close', ()))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self) -> 'Archipelago':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--islands', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--trees', type=int, default=40)
+    parser.add_argument('--steps', type=int, default=10000)
+    parser.add_argument('--interval', type=int, default=500)
+    parser.add_argument('--migrants', type=int, default=2)
+    parser.add_argument('--topology', choices=tuple(TOPOLOGIES), default='ring')
+    parser.add_argument('--report-every', type=int, default=100)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    with Archipelago(islands=args.islands, started_tree=args.trees, interval=args.interval,
+                     migrants=args.migrants, topology=args.topology, report_every=args.report_every,
+                     seed=args.seed) as archipelago:
+        for stats in archipelago.run(args.steps):
+            print("island {island}: step {steps}, {trees} trees, {cells} cells, generation {generation}, "
+                  "{genomes} genomes ({phenotypes} phenotypes), {immigrants} immigrants".format(**stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
-import random
-from typing import List, Optional, Tuple
-import copy
+from typing import List, Tuple
+import argparse
 import os
 import tkinter as tk
 from tkinter import filedialog
@@ -8,242 +7,15 @@ from threading import Thread
 import sys
 
 from settings import *
+import engine
+from autosave import Autosaver
+from history import History
+from genome import read_genome, write_genome
+from trajectory import Trajectory
 
+import numpy as np
 import pygame
 
-pygame.init()
-
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("Tree evolution")
-
-class Cell:
-    def __init__(self, simulation: 'Simulation', tree: 'Tree', x: int, y: int, gen: Optional[int] = None, state: Optional[str] = None) -> None:
-        self.simulation = simulation
-        self.tree = tree
-        self.x = x
-        self.y = y
-        self.level = 0
-        self.energy = 0
-        self.last_energy = 0
-        self.gen = gen if gen else 0
-        self.gen_number = tree.genome.genes.index(gen) if gen in tree.genome.genes else 0
-        self.state = state if state else '0'
-
-        self.update_level()
-
-    def update_level(self) -> int:
-        cell_y = rows - self.y - 1
-        new_level = cell_y + self.simulation.sun_level
-        self.level = min(new_level, 16)
-
-    def how_mutch_upper(self) -> int:
-        count = 0
-        y_above = self.y - 1
-        while y_above >= 0:
-            if (self.x, y_above) in self.simulation.occupied_positions:
-                count += 1
-            y_above -= 1
-        return count
-
-    def update_energy(self) -> int:
-        upper = self.how_mutch_upper()
-        self.update_level()
-        self.energy += self.level * max(3 - upper, 0)
-        self.last_energy = self.energy
-        return self.energy
-
-    def draw_energy(self, screen: pygame.Surface) -> None:
-        font = pygame.font.SysFont(None, 12)
-        string = f'{self.gen_number}'
-        energy_text = font.render(string, True, (0, 0, 0))
-        screen.blit(energy_text, (self.x * cell_size + 3, self.y * cell_size + 3))
-
-
-class Genome:
-    def __init__(self, tree: 'Tree', genes: List[List[int]] = None, color: Tuple[int, int, int] = None, ancestral_color: Tuple[int, int, int] = None) -> None:
-        self.tree = tree
-        self.genes = genes if genes else [self.generate_gen(i) for i in range(16)]
-        self.color = color if color is not None else self.generate_color()
-        self.ancestral_color = ancestral_color if ancestral_color else self.color
-
-    @staticmethod
-    def generate_gen(index: int) -> List[List[int]]:
-        result = []
-        for _ in range(4):
-            num = random.randint(0, 31)
-            if num <= 15:
-                result.append(num)
-            else:
-                result.append(30)
-
-        if index == 0:
-            count_30 = result.count(30)
-            while count_30 > 2:
-                result[result.index(30)] = random.randint(0, 15)
-                count_30 -= 1
-
-        return result
-
-    @staticmethod
-    def generate_color() -> Tuple[int, int, int]:
-        return (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-    
-
-class Tree:
-    def __init__(self, simulation: 'Simulation', x: int = None, y: int = None, genome: List[Tuple[int, int, int]] = None, color_gen: Tuple[int, int, int] = None, die_age: int = None, ancestral_color: Tuple[int, int, int] = None) -> None:
-        self.simulation = simulation
-        self.cells: List[Cell] = []
-        self.energy: int = 300
-        self.getting_energy = sum([cell.energy for cell in self.cells if cell.state == '1'])
-        self.waste_energy: int = len(self.cells) * 13
-        self.genome = Genome(self, genes=genome, color=color_gen, ancestral_color=ancestral_color)
-        self.growth_energy = 18
-        self.age = 0
-        self.die_age = die_age if die_age else random.randint(88, 92)
-        self.state = 1
-
-        self.birth(x, y)
-        self.update_energy()
-
-    def birth(self, x, y) -> None:
-        if x and y:
-            self.cells.append(Cell(simulation=self.simulation, tree=self, x=x, y=y, gen=self.genome.genes[0]))
-        else:
-            self.cells.append(Cell(simulation=self.simulation, tree=self, x=random.randint(5, cols-1), y=rows - 1, gen=self.genome.genes[0]))
-
-    def grow(self) -> None:
-        for cell in self.cells:
-            if cell.state == '0' and cell.energy >= self.growth_energy:
-                is_growed = False
-                can_grow = False
-                
-                directions = [
-                    (cell.x, cell.y - 1),
-                    (cell.x - 1, cell.y),
-                    (cell.x + 1, cell.y),
-                    (cell.x, cell.y + 1)  
-                ]
-
-                for i, (new_x, new_y) in enumerate(directions):
-                    if cell.gen[i] == 30:
-                        continue
-
-                    new_x = cols - 1 if new_x < 0 else 0 if new_x >= cols else new_x
-
-                    if 0 <= new_y < rows and new_y >= 19 and not (new_x, new_y) in self.simulation.occupied_positions:
-                        can_grow = True 
-                        self.cells.append(Cell(simulation=self.simulation, tree=self, x=new_x, y=new_y, gen=self.genome.genes[cell.gen[i]]))
-                        is_growed = True
-
-                if is_growed:
-                    cell.energy -= self.growth_energy
-                    cell.state = '1'
-
-                if not can_grow:
-                    cell.state = '1'
-        
-                self.simulation.update_cell_grid()
-
-    def update_energy(self) -> None:
-        growed_cells = [cell for cell in self.cells if cell.state == '1']
-
-        self.getting_energy = 0
-
-        for cell in growed_cells:
-            self.getting_energy += cell.energy
-            cell.energy = 0
-
-        self.waste_energy = len(self.cells) * 13
-        self.energy += self.getting_energy - self.waste_energy
-
-    def update_cells(self) -> None:
-        for cell in self.cells:
-            cell.update_energy()
-
-    def check_death(self) -> None:
-        if self.state == 1:
-            if self.energy <= 0 or self.age >= self.die_age:
-                self.cells = [cell for cell in self.cells if cell.state == '0']
-                self.state = 0
-        elif self.state == 0:
-            if len(self.cells) == 0:
-                self.die()
-            
-            for cell in self.cells:
-                if cell.y == rows - 1:
-                    genome_copy = copy.deepcopy(self.genome.genes)
-                    mutated_genome, mutated = self.mutate(genome=genome_copy, energy=self.energy)
-                    die_age = self.mutate_die_age(self.die_age)
-                    if mutated:
-                        self.simulation.generation += 1
-                        self.simulation.trees.append(Tree(simulation=self.simulation, x=cell.x, y=cell.y,
-                                                          genome=mutated_genome, die_age=die_age,
-                                                          ancestral_color=self.genome.ancestral_color))
-                    else:
-                        self.simulation.trees.append(Tree(simulation=self.simulation, x=cell.x, y=cell.y,
-                                                          genome=mutated_genome, color_gen=self.genome.color,
-                                                          die_age=die_age, ancestral_color=self.genome.ancestral_color))
-                    
-                    self.cells.remove(cell)
-
-    @staticmethod
-    def mutate(genome, energy, max_energy=500, min_chance=0.1, max_chance=0.3) -> List[Tuple[int, int, int]]:
-        normalized_energy = max(0, min(energy / max_energy, 1))
-        mutation_chance = min_chance + (1 - normalized_energy) * (max_chance - min_chance)
-
-        if random.random() > mutation_chance:
-            return genome, 0
-
-        gene = random.randint(0, 15)
-        position = random.randint(0, 3)
-        value = random.randint(0, 15)
-
-        genome[gene][position] = value
-
-        return genome, 1
-
-    @staticmethod
-    def mutate_die_age(age, chance=0.25) -> None:
-        if random.random() > chance:
-            return age
-
-        pom = random.randint(0, 1)
-        if pom == 0:
-            return age + 1
-        else:
-            return age - 1
-
-    def die(self) -> None:
-        self.cells = []
-        self.energy = 0
-        self.age = 0
-        self.simulation.trees.remove(self)
-
-    def fall_cells(self) -> None:
-        for cell in self.cells:
-            if cell.y < rows - 1 and not (cell.x, cell.y + 1) in self.simulation.occupied_positions:
-                cell.y += 1
-            elif cell.y == rows - 1:
-                pass
-            else:
-                self.cells.remove(cell)
-
-    def check_for_downtime(self) -> None:
-        if len(self.cells) == 1 and self.age >= 5:
-            self.die()
-
-    def step(self) -> None:
-        if self.state == 1:
-            self.age += 1
-            self.grow()
-            self.update_cells()
-            self.update_energy()
-            self.check_death()
-            self.check_for_downtime()
-        elif self.state == 0:
-            self.fall_cells()
-            self.check_death()
-
 
 class TreeDetailsWindow:
     def __init__(self, simulation: 'Simulation', tree: 'Tree') -> None:
@@ -263,6 +35,7 @@ class TreeDetailsWindow:
             tk.Label(left_frame, text=f"Energy: {tree.energy} ({tree.getting_energy-tree.waste_energy})", font=("Arial", 12), bg='#242424', fg='#5E9F61').pack(pady=5)
             tk.Label(left_frame, text=f"Getting: {tree.getting_energy} Waste: {tree.waste_energy}", font=("Arial", 12), bg='#242424', fg='#5E9F61').pack(pady=5)
             tk.Label(left_frame, text=f"Age: {tree.age}/{tree.die_age}", font=("Arial", 12), bg='#242424', fg='#5E9F61').pack(pady=5)
+            tk.Label(left_frame, text=f"Same genome: {tree.genome.population}", font=("Arial", 12), bg='#242424', fg='#5E9F61').pack(pady=5)
 
             right_frame = tk.Frame(self.window, bg='#242424')
             right_frame.pack(side=tk.LEFT, padx=0, pady=10, fill=tk.BOTH, expand=True)
@@ -314,29 +87,68 @@ class TreeDetailsWindow:
 
 
 class UI:
+    """The menu bar.
+
+    Everything that does not change while the window is open (the field,
+    button frames, labels) is drawn once onto ``background`` and blitted
+    each frame; ``draw_controls`` then adds the parts that follow the
+    simulation. The background is redrawn when the window size, the cell
+    size or the colors change.
+    """
+
     def __init__(self, simulation: 'Simulation') -> None:
         self.simulation = simulation
+        self.screen = pygame.display.get_surface()
         self.pause_button_rect = pygame.Rect(1200, 40, 40, 40)
         self.exit_button_rect = pygame.Rect(1250, 40, 40, 40)
         self.save_button_rect = pygame.Rect(480, 10, 90, 40)
         self.load_button_rect = pygame.Rect(480, 60, 90, 40)
         self.radio_x = 200
         self.font = pygame.font.SysFont('Arial', 20)
+        self.small_font = pygame.font.SysFont('Arial', 16)
+        self.generation_font = pygame.font.SysFont('Arial', 21)
         self.icon_color = (94, 149, 95)
         self.bg_color = (66, 66, 66)
+        self.field_color = (36, 36, 36)
+        self.background = None
+        self.background_key = None
 
     def draw_button(self, screen, rect, text, offset_x=0, offset_y=0) -> None:
         pygame.draw.rect(screen, self.bg_color, rect, 2)
         rendered_text = self.font.render(text, True, self.icon_color)
         screen.blit(rendered_text, (rect.x + offset_x, rect.y + offset_y))
 
-    def draw_pause_button(self) -> None:
-        pygame.draw.rect(screen, self.bg_color, self.pause_button_rect, 2)
+    def draw_background(self, area: pygame.Rect = None) -> None:
+        """Blit the cached background, or just the ``area`` part of it."""
+        key = (self.screen.get_size(), cell_size, menu_height, self.field_color, self.bg_color, self.icon_color)
+        if key != self.background_key:
+            self.background = pygame.Surface(self.screen.get_size())
+            self.draw_field(self.background)
+            self.draw_chrome(self.background)
+            self.background_key = key
+        if area is None:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            self.screen.blit(self.background, area, area)
+
+    def draw_field(self, surface: pygame.Surface) -> None:
+        surface.fill((0, 0, 0))
+        surface.fill(self.field_color, (0, 0, cols * cell_size, menu_height * cell_size))
 
+    def draw_chrome(self, surface: pygame.Surface) -> None:
+        pygame.draw.rect(surface, self.bg_color, self.pause_button_rect, 2)
+        self.draw_exit_button(surface)
+        self.draw_buttons(surface)
+        self.draw_speed_buttons(surface)
+        self.draw_sun_level_buttons(surface)
+        self.draw_radio_labels(surface)
+        surface.blit(self.generation_font.render("generation", True, self.icon_color), (40, 40))
+
+    def draw_pause_button(self) -> None:
         if self.simulation.paused:
-            pygame.draw.rect(screen, self.icon_color, pygame.Rect(self.pause_button_rect.x + 13.5,
+            pygame.draw.rect(self.screen, self.icon_color, pygame.Rect(self.pause_button_rect.x + 13.5,
                                                                   self.pause_button_rect.y + 10, 5, 20))
-            pygame.draw.rect(screen, self.icon_color, pygame.Rect(self.pause_button_rect.x + 23.5,
+            pygame.draw.rect(self.screen, self.icon_color, pygame.Rect(self.pause_button_rect.x + 23.5,
                                                                   self.pause_button_rect.y + 10, 5, 20))
         else:
             points = [
@@ -344,74 +156,66 @@ class UI:
                 (self.pause_button_rect.x + 30, self.pause_button_rect.y + 20),
                 (self.pause_button_rect.x + 12.5, self.pause_button_rect.y + 30)
             ]
-            pygame.draw.polygon(screen, self.icon_color, points)
+            pygame.draw.polygon(self.screen, self.icon_color, points)
     
-    def draw_exit_button(self) -> None:
-        pygame.draw.rect(screen, self.bg_color, self.exit_button_rect, 2)
-
+    def draw_exit_button(self, surface: pygame.Surface) -> None:
         center_x = self.exit_button_rect.x + self.exit_button_rect.width // 2
         center_y = self.exit_button_rect.y + self.exit_button_rect.height // 2
 
-        pygame.draw.line(screen, self.icon_color,
+        pygame.draw.line(surface, self.icon_color,
                         (center_x - 10, center_y - 10),
                         (center_x + 10, center_y + 10), 3)
-        pygame.draw.line(screen, self.icon_color,
+        pygame.draw.line(surface, self.icon_color,
                         (center_x - 10, center_y + 10),
                         (center_x + 10, center_y - 10), 3)
 
-        pygame.draw.rect(screen, self.bg_color, self.exit_button_rect, 2)
-        
-    def draw_radio_buttons(self) -> None:
+        pygame.draw.rect(surface, self.bg_color, self.exit_button_rect, 2)
+
+    def draw_radio_labels(self, surface: pygame.Surface) -> None:
         options = ['Normal', 'Energy', 'Family']
         for i, option in enumerate(options):
             y_pos = 30 + (i * 30)
-            pygame.draw.circle(screen, self.bg_color, (self.radio_x, y_pos), 10, 1)
-
-            if self.simulation.display_mode == option.lower():
-                pygame.draw.circle(screen, self.icon_color, (self.radio_x, y_pos), 5)
-
+            pygame.draw.circle(surface, self.bg_color, (self.radio_x, y_pos), 10, 1)
             label_text = self.font.render(option, True, self.icon_color)
-            screen.blit(label_text, (self.radio_x + 20, y_pos - 10))
+            surface.blit(label_text, (self.radio_x + 20, y_pos - 10))
+
+    def draw_radio_buttons(self) -> None:
+        options = ['normal', 'energy', 'family']
+        y_pos = 30 + options.index(self.simulation.display_mode) * 30
+        pygame.draw.circle(self.screen, self.icon_color, (self.radio_x, y_pos), 5)
 
     def draw_generation(self) -> None:
-        font = pygame.font.SysFont('Arial', 21)
-        generation_label = font.render("generation", True, self.icon_color)
-        generation_number = font.render(f"{self.simulation.generation}", True, self.icon_color)
-
-        screen.blit(generation_label, (40, 40))
-        screen.blit(generation_number, (50, 70))
-
-    def draw_buttons(self) -> None:
-        self.draw_button(screen, self.save_button_rect, "Save", 23, 10)
-        self.draw_button(screen, self.load_button_rect, "Load", 23, 10)
-
-    def draw_speed_buttons(self) -> None:
-        font = pygame.font.SysFont('Arial', 16)
-        self.draw_button(screen, pygame.Rect(300, 60, 40, 40), "-", 18, 10)
-        speed_text = font.render(f'Speed: {(500-self.simulation.simulation_speed)/100}', True, self.icon_color)
-        screen.blit(speed_text, (345, 70))
-        self.draw_button(screen, pygame.Rect(430, 60, 40, 40), "+", 15, 10)
-
-    def draw_sun_level_buttons(self) -> None:
-        font = pygame.font.SysFont('Arial', 16)
-        self.draw_button(screen, pygame.Rect(300, 10, 40, 40), "-", 18, 10)
-        sun_text = font.render(f'Sun: {self.simulation.sun_level}', True, self.icon_color)
-        screen.blit(sun_text, (362 if self.simulation.sun_level < 10 else 359, 20))
-        self.draw_button(screen, pygame.Rect(430, 10, 40, 40), "+", 15, 10)
-
-    def draw_field(self) -> None:
-        for row in range(rows):
-            for col in range(cols):
-                color = (36, 36, 36) if row < menu_height else (0, 0, 0)
-                pygame.draw.rect(screen, color, (col * cell_size, row * cell_size, cell_size, cell_size), 1 if row >= 19 else 0)
+        generation_number = self.generation_font.render(f"{self.simulation.generation}", True, self.icon_color)
+        self.screen.blit(generation_number, (50, 70))
+
+    def draw_buttons(self, surface: pygame.Surface) -> None:
+        self.draw_button(surface, self.save_button_rect, "Save", 23, 10)
+        self.draw_button(surface, self.load_button_rect, "Load", 23, 10)
+
+    def draw_speed_buttons(self, surface: pygame.Surface) -> None:
+        self.draw_button(surface, pygame.Rect(300, 60, 40, 40), "-", 18, 10)
+        self.draw_button(surface, pygame.Rect(430, 60, 40, 40), "+", 15, 10)
+
+    def draw_speed(self) -> None:
+        speed_text = self.small_font.render(f'Speed: {(500-self.simulation.simulation_speed)/100}', True, self.icon_color)
+        self.screen.blit(speed_text, (345, 70))
+
+    def draw_sun_level_buttons(self, surface: pygame.Surface) -> None:
+        self.draw_button(surface, pygame.Rect(300, 10, 40, 40), "-", 18, 10)
+        self.draw_button(surface, pygame.Rect(430, 10, 40, 40), "+", 15, 10)
+
+    def draw_sun_level(self) -> None:
+        sun_text = self.small_font.render(f'Sun: {self.simulation.sun_level}', True, self.icon_color)
+        self.screen.blit(sun_text, (362 if self.simulation.sun_level < 10 else 359, 20))
 
     def draw(self) -> None:
-        self.draw_field()
+        self.draw_background()
+        self.draw_controls()
+
+    def draw_controls(self) -> None:
         self.draw_pause_button()
-        self.draw_exit_button()
-        self.draw_buttons()
-        self.draw_speed_buttons()
-        self.draw_sun_level_buttons()
+        self.draw_speed()
+        self.draw_sun_level()
         self.draw_radio_buttons()
         self.draw_generation()
 
@@ -480,17 +284,22 @@ class EventHandler:
                 cell_x = mouse_x // cell_size
                 cell_y = mouse_y // cell_size
 
-                for tree in self.simulation.trees:
-                    for cell in tree.cells:
-                        if cell.x == cell_x and cell.y == cell_y:
-                            TreeDetailsWindow(simulation=self.simulation, tree=tree)
-                            self.simulation.tree_infos.append(tree)
+                cell = self.simulation.grid.get(cell_x, cell_y)
+                if cell:
+                    TreeDetailsWindow(simulation=self.simulation, tree=cell.tree)
+                    self.simulation.tree_infos.append(cell.tree)
 
             elif event.type == pygame.KEYDOWN:
                 # Pause
                 if event.key == pygame.K_SPACE:
                     self.simulation.paused = not self.simulation.paused
 
+                # Rewind
+                elif event.key == pygame.K_LEFT:
+                    self.simulation.rewind(100 if event.mod & pygame.KMOD_SHIFT else 1)
+                elif event.key == pygame.K_RIGHT and self.simulation.paused:
+                    self.simulation.step()
+
                 # View Mode
                 elif event.key == pygame.K_z:
                     self.handle_radio_buttons(self.ui.radio_x, 20)
@@ -504,63 +313,211 @@ class Renderer:
     def __init__(self, simulation):
         self.simulation = simulation
         self.screen = pygame.display.get_surface()
+        self.canvas = self.screen
 
-    def draw(self):
-        self.screen.fill((0, 0, 0))
+    def draw(self) -> List[pygame.Rect]:
+        """Draw a frame; returns the parts of the screen that changed."""
         self.simulation.ui.draw()
 
-        for cell in self.simulation.cell_grid.values():
+        grid = self.simulation.grid
+        for cell in grid.cells[grid.occupied]:
             self._draw_cell(cell)
+        return [self.screen.get_rect()]
 
     def _draw_cell(self, cell):
-        x = cell.x * cell_size
-        y = cell.y * cell_size
-        rect = (x, y, cell_size, cell_size)
+        genome = cell.tree.genome
+        self.draw_cell(cell.x, cell.y, cell.state == '1', genome.color, genome.ancestral_color, cell.last_energy)
+
+    def draw_cell(self, x, y, grown, color, ancestral_color, last_energy):
+        rect = (x * cell_size, y * cell_size, cell_size, cell_size)
 
         if self.simulation.display_mode == 'normal':
-            color = cell.tree.genome.color if cell.state == '1' else (240, 248, 255)
-            pygame.draw.rect(self.screen, color, rect)
+            color = color if grown else (240, 248, 255)
+            pygame.draw.rect(self.canvas, color, rect)
         
         elif self.simulation.display_mode == 'energy':
-            energy_color = (min(255, int(cell.last_energy * 10) + 50), 0, 0)
-            pygame.draw.rect(self.screen, energy_color, rect)
+            energy_color = (min(255, int(last_energy * 10) + 50), 0, 0)
+            pygame.draw.rect(self.canvas, energy_color, rect)
         
         elif self.simulation.display_mode == 'family':
-            color = cell.tree.genome.ancestral_color
-            pygame.draw.rect(self.screen, color if cell.state == '1' else (240, 248, 255), rect)
+            pygame.draw.rect(self.canvas, ancestral_color if grown else (240, 248, 255), rect)
+
+
+class DirtyRenderer(Renderer):
+    """Keeps the world on its own surface and redraws only what changed since the last frame.
+
+    Cells that were added, moved, removed or grew come from the renderer's
+    own ``ChangeLog`` on the grid (see ``WorldGrid.subscribe``); in 'energy'
+    mode cells whose shown energy changed are redrawn too. Switching the
+    display mode, a family color reset, a new grid, as after rewinding, or
+    losing the log redraws the world once. The menu bar is redrawn every
+    frame.
+    """
+
+    def __init__(self, simulation):
+        super().__init__(simulation)
+        self.canvas = pygame.Surface(self.screen.get_size())
+        self.menu_rect = pygame.Rect(0, 0, width, menu_height * cell_size)
+        self.world_rect = pygame.Rect(0, self.menu_rect.bottom, width, height - self.menu_rect.bottom)
+        self.grid = None
+        self.log = None
+        self.display_mode = None
+        self.ancestry_resets = None
+        self.energy = None
+
+    def draw(self) -> List[pygame.Rect]:
+        simulation = self.simulation
+        if (simulation.grid is not self.grid or self.log not in self.grid.changes
+                or simulation.display_mode != self.display_mode
+                or simulation.ancestry_resets != self.ancestry_resets):
+            dirty = self.redraw()
+        else:
+            dirty = self.update()
+
+        for rect in dirty:
+            self.screen.blit(self.canvas, rect, rect)
+        self.simulation.ui.draw_background(self.menu_rect)
+        self.simulation.ui.draw_controls()
+        return dirty + [self.menu_rect]
+
+    def redraw(self) -> List[pygame.Rect]:
+        simulation = self.simulation
+        if self.grid is not None:
+            self.grid.unsubscribe(self.log)
+        self.grid = grid = simulation.grid
+        self.log = grid.subscribe()
+        self.display_mode = simulation.display_mode
+        self.ancestry_resets = simulation.ancestry_resets
+        self.energy = self.energy_colors()
+
+        self.canvas.fill((0, 0, 0))
+        for cell in grid.cells[grid.occupied]:
+            self._draw_cell(cell)
+        return [self.world_rect]
+
+    def update(self) -> List[pygame.Rect]:
+        grid = self.grid
+        changes = self.log.collect(self.simulation.steps)
+        cleared = np.concatenate([changes.removed, changes.moved[:, :2]])
+        drawn = [changes.moved[:, 2:], changes.added[:, :2], changes.changed[:, :2]]
+        if self.display_mode == 'energy':
+            energy = self.energy_colors()
+            drawn.append(np.argwhere(energy != self.energy)[:, ::-1])
+            self.energy = energy
+
+        for x, y in cleared.tolist():
+            self.canvas.fill((0, 0, 0), (x * cell_size, y * cell_size, cell_size, cell_size))
+        drawn = np.unique(np.concatenate(drawn), axis=0)
+        for x, y in drawn.tolist():
+            cell = grid.cells[y, x]
+            if cell is not None:
+                self._draw_cell(cell)
+
+        positions = np.unique(np.concatenate([cleared, drawn]), axis=0)
+        return [pygame.Rect(x * cell_size, y * cell_size, cell_size, cell_size) for x, y in positions.tolist()]
+
+    def energy_colors(self) -> np.ndarray:
+        grid = self.grid
+        return np.where(grid.slot >= 0, np.minimum(255, grid.last_energy * 10 + 50), 0)
+
+
+class FramebufferRenderer(Renderer):
+    """Draws the world as one pixel per cell with NumPy, then scales it up in a single blit.
+
+    Every position gets an index into a color lookup table: 0 for empty,
+    1 for a sprout and ``2 + i`` for a grown cell of the ``i``-th tree in
+    'normal' and 'family' mode, or ``1 + last_energy`` (saturating) in
+    'energy' mode. The tables hold colors already packed into the surface's
+    pixel format, so a frame is a table lookup, one ``surfarray`` upload and
+    one scaled blit, and switching modes only switches the table. The tree
+    tables are rebuilt when the set of trees or their family colors change.
+    """
+
+    SPROUT = (240, 248, 255)
+    ENERGY_STEPS = 22  # int(energy * 10) + 50 reaches 255 at energy 21
+
+    def __init__(self, simulation):
+        super().__init__(simulation)
+        self.image = pygame.Surface((simulation.cols, simulation.rows), 0, 32)
+        self.scaled = pygame.Surface((simulation.cols * cell_size, simulation.rows * cell_size), 0, 32)
+        self.world_rect = pygame.Rect(0, menu_height * cell_size, width, height - menu_height * cell_size)
+        energy = [(min(255, energy * 10 + 50), 0, 0) for energy in range(self.ENERGY_STEPS)]
+        self.energy_table = self.pack([(0, 0, 0)] + energy)
+        self.menu_rect = pygame.Rect(0, 0, width, menu_height * cell_size)
+        self.tree_key = None
+        self.tree_index = None
+        self.first_id = 0
+        self.tables = {}
+
+    def pack(self, colors) -> np.ndarray:
+        """``colors`` as pixel values of ``self.image``."""
+        colors = np.array(colors, dtype=np.uint32).reshape(-1, 3)
+        shifts = self.image.get_shifts()
+        return colors[:, 0] << shifts[0] | colors[:, 1] << shifts[1] | colors[:, 2] << shifts[2]
+
+    def update_tables(self) -> None:
+        simulation = self.simulation
+        trees = simulation.trees
+        # Trees are kept in id order and new ids are always larger, so any
+        # birth moves the last id and any death alone shrinks the list.
+        key = (simulation.grid, simulation.ancestry_resets, len(trees),
+               trees[0].id if trees else None, trees[-1].id if trees else None)
+        if key == self.tree_key:
+            return
+        self.tree_key = key
+        ids = np.array([tree.id for tree in trees], dtype=np.int64)
+        # Table index of every tree, by id counted from the oldest living tree.
+        self.first_id = ids[0] if len(ids) else 0
+        self.tree_index = np.zeros(ids[-1] - self.first_id + 1 if len(ids) else 0, dtype=np.int64)
+        self.tree_index[ids - self.first_id] = np.arange(2, len(ids) + 2)
+        head = [(0, 0, 0), self.SPROUT]
+        self.tables = {
+            'normal': self.pack(head + [tree.genome.color for tree in trees]),
+            'family': self.pack(head + [tree.genome.ancestral_color for tree in trees]),
+        }
+
+    def draw(self) -> List[pygame.Rect]:
+        simulation = self.simulation
+        grid = simulation.grid
+        store = grid.store
+        positions = np.flatnonzero(grid.slot >= 0)
+        slots = grid.slot.ravel()[positions]
+
+        index = np.zeros(grid.slot.size, dtype=np.int64)
+        if simulation.display_mode == 'energy':
+            table = self.energy_table
+            index[positions] = 1 + np.minimum(store.last_energy[slots], self.ENERGY_STEPS - 1)
+        else:
+            self.update_tables()
+            table = self.tables[simulation.display_mode]
+            grown = store.state[slots] == 1
+            index[positions] = np.where(grown, self.tree_index[store.tree[slots] - self.first_id], 1)
+
+        pixels = table[index].reshape(grid.slot.shape)
+        pygame.surfarray.blit_array(self.image, pixels.T)
+        pygame.transform.scale(self.image, self.scaled.get_size(), self.scaled)
 
+        simulation.ui.draw_background(self.menu_rect)
+        simulation.ui.draw_controls()
+        self.screen.blit(self.scaled, self.world_rect, self.world_rect)
+        return [self.screen.get_rect()]
 
-class Simulation:
-    def __init__(self, started_tree: int = None) -> None:
+
+RENDERERS = {'full': Renderer, 'dirty': DirtyRenderer, 'framebuffer': FramebufferRenderer}
+
+
+class Simulation(engine.Simulation):
+    def __init__(self, started_tree: int = None, seed: int = None) -> None:
+        super().__init__(started_tree=started_tree, seed=seed)
         self.running = True
-        self.trees = []
         self.tree_infos = []
         self.display_mode = 'normal'
         self.paused = False
-        self.generation = 0
         self.simulation_speed = 100
-        self.sun_level = 6
         self.ui = UI(self)
-        self.cell_grid = {}
-        self.occupied_positions = set()
-        self.renderer = Renderer(self)
-
-        if started_tree:
-            for _ in range(started_tree):
-                self.add_tree()
-    
-    def update_cell_grid(self):
-        new_cell_grid = {}
-        for tree in self.trees:
-            for cell in tree.cells:
-                new_cell_grid[(cell.x, cell.y)] = cell
-
-        self.cell_grid = new_cell_grid
-        self.occupied_positions = set(self.cell_grid.keys())
-
-    def add_tree(self, genome: List[Tuple[int, int, int]] = None, x: int = None, y: int = None) -> None:
-        self.trees.append(Tree(simulation=self, genome=genome[:-1] if genome else None,
-                             color_gen=genome[-1] if genome and len(genome) == 17 else None, x=x, y=y))
+        self.renderer = RENDERERS[render_mode](self)
+        self.autosaver = Autosaver(self, autosave_dir, autosave_interval, autosave_keep)
+        self.history = History(self, history_keyframe_every, history_budget)
 
     def save_genome(self) -> None:
         self.selected_tree = None
@@ -573,10 +530,9 @@ class Simulation:
                         clicked_cell_x = mouse_x // cell_size
                         clicked_cell_y = mouse_y // cell_size
 
-                        for tree in self.trees:
-                            for cell in tree.cells:
-                                if cell.x == clicked_cell_x and cell.y == clicked_cell_y:
-                                    tree_for_save = tree
+                        cell = self.grid.get(clicked_cell_x, clicked_cell_y)
+                        if cell:
+                            tree_for_save = cell.tree
                     elif event.button == 3:
                         return
 
@@ -591,10 +547,7 @@ class Simulation:
                                                 filetypes=[("Text files", "*.txt")])
 
         if file_path:
-            with open(file_path, 'w') as f:
-                for gene in tree.genome.genes:
-                    f.write(','.join(map(str, gene)) + '\n')
-                f.write(','.join(map(str, tree.genome.color)) + '\n')
+            write_genome(file_path, tree.genome.genes, tree.genome.color)
 
     def load_genome(self) -> None:
         root = tk.Tk()
@@ -602,11 +555,7 @@ class Simulation:
         file_path = filedialog.askopenfilename(initialdir='saves', filetypes=[("Text files", "*.txt")])
 
         if file_path:
-            with open(file_path, 'r') as f:
-                genome = [list(map(int, line.strip().split(','))) if i != 16 
-                         else tuple(map(int, line.strip().split(','))) 
-                         for i, line in enumerate(f)]
-            
+            genome = read_genome(file_path)
             position = self._get_placement_position()
             if position:
                 self.add_tree(genome=genome, x=position[0], y=position[1])
@@ -621,39 +570,186 @@ class Simulation:
                     clicked_cell_x = mouse_x // cell_size
                     clicked_cell_y = mouse_y // cell_size
 
-                    free_space = not any(c.x == clicked_cell_x and c.y == clicked_cell_y 
-                                       for tree in self.trees for c in tree.cells)
-                    
-                    while (clicked_cell_y < rows - 1 and 
-                           not any(c.x == clicked_cell_x and c.y == clicked_cell_y + 1 
-                                 for tree in self.trees for c in tree.cells)):
-                        clicked_cell_y += 1
+                    free_space = (clicked_cell_x, clicked_cell_y) not in self.grid
+                    clicked_cell_y = self.grid.landing_row(clicked_cell_x, clicked_cell_y)
 
                     if free_space:
                         return (clicked_cell_x, clicked_cell_y)
         return None
 
-    def check_for_ancestral(self):
-        if len(self.trees) <= 1:
-            return
-        
-        if len({tree.genome.ancestral_color for tree in self.trees}) == 1:
-            for tree in self.trees:
-                tree.genome.ancestral_color = tree.genome.color
+    def rewind(self, steps: int) -> None:
+        self.paused = True
+        self.history.rewind(max(self.history.first_step, self.steps - steps))
+        self.autosaver.last_step = min(self.autosaver.last_step, self.steps)
 
     def run(self):
         event_handler = EventHandler(self)
 
+        try:
+            while self.running:
+                event_handler.handle_events()
+                pygame.display.update(self.renderer.draw())
+
+                if not self.paused:
+                    self.step()
+                    self.autosaver.update()
+
+                pygame.time.delay(self.simulation_speed)
+        finally:
+            self.autosaver.close()
+
+        pygame.quit()
+
+
+class ReplayUI(UI):
+    def __init__(self, replay: 'Replay') -> None:
+        super().__init__(replay)
+        self.timeline_rect = pygame.Rect(600, 70, 560, 16)
+
+    def frame_at(self, mouse_x: int) -> int:
+        frames = len(self.simulation.trajectory)
+        fraction = (mouse_x - self.timeline_rect.x) / self.timeline_rect.width
+        return min(frames - 1, max(0, round(fraction * (frames - 1))))
+
+    def draw_timeline(self) -> None:
+        replay = self.simulation
+        frames = len(replay.trajectory)
+        played = (replay.index / (frames - 1)) if frames > 1 else 1
+        marker_x = self.timeline_rect.x + round(played * (self.timeline_rect.width - 4))
+        pygame.draw.rect(self.screen, self.icon_color, pygame.Rect(marker_x, self.timeline_rect.y, 4, self.timeline_rect.height))
+
+        direction = 'forward' if replay.direction > 0 else 'backward'
+        label = self.font.render(f"Step {replay.frame['step']}  ({replay.index + 1}/{frames}, {direction})  "
+                                 f"Sun: {replay.sun_level}", True, self.icon_color)
+        self.screen.blit(label, (self.timeline_rect.x, 30))
+
+    def draw_chrome(self, surface: pygame.Surface) -> None:
+        pygame.draw.rect(surface, self.bg_color, self.pause_button_rect, 2)
+        self.draw_exit_button(surface)
+        self.draw_speed_buttons(surface)
+        self.draw_radio_labels(surface)
+        surface.blit(self.generation_font.render("generation", True, self.icon_color), (40, 40))
+        pygame.draw.rect(surface, self.bg_color, self.timeline_rect, 2)
+
+    def draw_controls(self) -> None:
+        self.draw_pause_button()
+        self.draw_speed()
+        self.draw_radio_buttons()
+        self.draw_generation()
+        self.draw_timeline()
+
+
+class ReplayEventHandler(EventHandler):
+    def handle_timeline(self, mouse_x: int, mouse_y: int) -> None:
+        if self.ui.timeline_rect.collidepoint(mouse_x, mouse_y):
+            self.simulation.seek(self.ui.frame_at(mouse_x))
+
+    def handle_events(self):
+        replay = self.simulation
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                mouse_x, mouse_y = pygame.mouse.get_pos()
+
+                self.handle_pause_button(mouse_x, mouse_y)
+                self.handle_exit_button(mouse_x, mouse_y)
+                self.handle_radio_buttons(mouse_x, mouse_y)
+                self.handle_speed_buttons(mouse_x, mouse_y)
+                self.handle_timeline(mouse_x, mouse_y)
+
+            elif event.type == pygame.KEYDOWN:
+                jump = 100 if event.mod & pygame.KMOD_SHIFT else 1
+
+                if event.key == pygame.K_SPACE:
+                    replay.paused = not replay.paused
+
+                # Seeking
+                elif event.key == pygame.K_RIGHT:
+                    replay.paused = True
+                    replay.seek(replay.index + jump)
+                elif event.key == pygame.K_LEFT:
+                    replay.paused = True
+                    replay.seek(replay.index - jump)
+                elif event.key == pygame.K_HOME:
+                    replay.seek(0)
+                elif event.key == pygame.K_END:
+                    replay.seek(len(replay.trajectory) - 1)
+                elif event.key == pygame.K_r:
+                    replay.direction = -replay.direction
+
+                # View Mode
+                elif event.key == pygame.K_z:
+                    self.handle_radio_buttons(self.ui.radio_x, 20)
+                elif event.key == pygame.K_x:
+                    self.handle_radio_buttons(self.ui.radio_x, 50)
+                elif event.key == pygame.K_c:
+                    self.handle_radio_buttons(self.ui.radio_x, 80)
+
+
+class Replay:
+    """Plays a recorded run (see ``trajectory.py``) back without simulating it.
+
+    Each frame is read straight from the recording, so jumping to any step
+    costs the same as moving to the next one, and a recording that is still
+    being written can be followed as it grows. Cells are drawn with the
+    ``Renderer`` of the live view; worlds wider or taller than the window
+    are cut to it.
+
+    Space plays and pauses, R reverses the direction, the arrow keys step
+    one frame (100 with Shift), Home and End jump to the ends and clicking
+    the timeline seeks.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.trajectory = Trajectory(path)
+        self.running = True
+        self.display_mode = 'normal'
+        self.paused = False
+        self.simulation_speed = 100
+        self.direction = 1
+        self.seek(0)
+        self.ui = ReplayUI(self)
+        self.renderer = Renderer(self)
+
+    @property
+    def generation(self) -> int:
+        return int(self.frame['generation'])
+
+    @property
+    def sun_level(self) -> int:
+        return int(self.frame['sun_level'])
+
+    def seek(self, index: int) -> None:
+        self.index = min(len(self.trajectory) - 1, max(0, index))
+        self.frame = self.trajectory[self.index]
+
+    def draw(self) -> None:
+        self.ui.draw()
+
+        frame = self.frame
+        cells = self.trajectory.cells(frame)
+        colors, ancestral_colors = self.trajectory.colors(frame)
+        inside = (cells['x'] < cols) & (cells['y'] < rows)
+        cells = cells[inside]
+        colors = colors[inside].tolist()
+        ancestral_colors = ancestral_colors[inside].tolist()
+        grown = (cells['state'] == 1).tolist()
+        last_energy = cells['last_energy'].tolist()
+        for i, (x, y) in enumerate(zip(cells['x'].tolist(), cells['y'].tolist())):
+            self.renderer.draw_cell(x, y, grown[i], colors[i], ancestral_colors[i], last_energy[i])
+
+    def run(self) -> None:
+        event_handler = ReplayEventHandler(self)
+
         while self.running:
             event_handler.handle_events()
-            self.update_cell_grid()
-            self.renderer.draw()
+            self.draw()
             pygame.display.flip()
 
             if not self.paused:
-                self.check_for_ancestral()
-                for tree in self.trees:
-                    tree.step()
+                self.seek(self.index + self.direction)
 
             pygame.time.delay(self.simulation_speed)
 
@@ -662,6 +758,7 @@ class Simulation:
 
 class Menu:
     def __init__(self):
+        self.screen = pygame.display.get_surface()
         self.input_box = pygame.Rect((width / 2) - 100, 290, 200, 50)
         self.color_inactive = pygame.Color('lightskyblue3')
         self.color_active = pygame.Color('dodgerblue2')
@@ -673,27 +770,27 @@ class Menu:
         self.small_font = pygame.font.SysFont('Arial', 30)
     
     def draw(self):
-        screen.fill((30, 30, 30))
+        self.screen.fill((30, 30, 30))
         
         title = self.font.render("Tree Evolution", True, (200, 200, 200))
-        screen.blit(title, (width // 2 - title.get_width() // 2, 50))
+        self.screen.blit(title, (width // 2 - title.get_width() // 2, 50))
         
         prompt = self.small_font.render("Enter initial number of trees:", True, (255, 255, 255))
-        screen.blit(prompt, (width // 2 - prompt.get_width() // 2, 200))
+        self.screen.blit(prompt, (width // 2 - prompt.get_width() // 2, 200))
         
-        pygame.draw.rect(screen, self.color, self.input_box, 2)
+        pygame.draw.rect(self.screen, self.color, self.input_box, 2)
         txt_surface = self.font.render(self.text, True, (255, 255, 255))
-        screen.blit(txt_surface, (self.input_box.x + 10, self.input_box.y + 5))
+        self.screen.blit(txt_surface, (self.input_box.x + 10, self.input_box.y + 5))
         
         self.start_button = pygame.Rect((width / 2) - 100, 350, 200, 50)
-        pygame.draw.rect(screen, (50, 205, 50), self.start_button)
+        pygame.draw.rect(self.screen, (50, 205, 50), self.start_button)
         start_text = self.font.render("Start", True, (0, 0, 0))
-        screen.blit(start_text, (self.start_button.x + 50, self.start_button.y + 5))
+        self.screen.blit(start_text, (self.start_button.x + 50, self.start_button.y + 5))
 
         self.end_button = pygame.Rect((width / 2) - 100, 410, 200, 50)
-        pygame.draw.rect(screen, (50, 205, 50), self.end_button)
+        pygame.draw.rect(self.screen, (50, 205, 50), self.end_button)
         end_text = self.font.render("Exit", True, (0, 0, 0))
-        screen.blit(end_text, (self.end_button.x + 60, self.end_button.y + 5))
+        self.screen.blit(end_text, (self.end_button.x + 60, self.end_button.y + 5))
         
     def run(self):
         while self.running:
@@ -733,8 +830,25 @@ class Menu:
             pygame.display.flip()
         return int(self.text)
 
-menu = Menu()
-initial_trees = menu.run()
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tree evolution")
+    parser.add_argument('--replay', metavar='TRAJECTORY', help="play back a run recorded with trajectory.Recorder")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((width, height))
+    pygame.display.set_caption("Tree evolution")
+
+    if args.replay:
+        Replay(args.replay).run()
+        return
+
+    menu = Menu()
+    initial_trees = menu.run()
+
+    simulation = Simulation(started_tree=initial_trees)
+    simulation.run()
+
 
-simulation = Simulation(started_tree=initial_trees)
-simulation.run()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import multiprocessing
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from engine import collect_energy, owned_cells, propose_growth
+
+Layout = Dict[str, Tuple[str, Tuple[int, ...], str]]
+
+
+class SharedArrays:
+    """NumPy arrays that live in named shared-memory blocks.
+
+    ``zeros`` allocates an array in a block of its own. A pooled simulation
+    allocates its cell store and occupancy grid this way, so workers read
+    them in place and nothing is copied per step. ``publish`` copies small
+    per-call arrays (tree ids, genome tables) into reusable blocks.
+    ``describe`` and ``publish`` give the layout entries workers pass to
+    ``attach`` to get zero-copy views of the same memory.
+    """
+
+    def __init__(self) -> None:
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        self.arrays: List[Tuple[np.ndarray, shared_memory.SharedMemory]] = []
+        # Unlinked blocks still mapped by arrays someone holds on to.
+        self.retired: List[shared_memory.SharedMemory] = []
+
+    def zeros(self, shape, dtype=float) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 64))
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array[...] = 0
+        self.arrays.append((array, block))
+        return array
+
+    def describe(self, array: np.ndarray) -> Tuple[str, Tuple[int, ...], str]:
+        for owned, block in self.arrays:
+            if owned is array:
+                return block.name, array.shape, array.dtype.str
+        raise ValueError("array is not in shared memory; call WorkerPool.adopt first")
+
+    def publish(self, arrays: Dict[str, np.ndarray]) -> Layout:
+        layout = {}
+        for name, values in arrays.items():
+            block = self.blocks.get(name)
+            if block is None or block.size < values.nbytes:
+                if block is not None:
+                    block.close()
+                    block.unlink()
+                block = self.blocks[name] = shared_memory.SharedMemory(create=True, size=max(2 * values.nbytes, 64))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+            layout[name] = (block.name, values.shape, values.dtype.str)
+        return layout
+
+    def release(self, keep: List[np.ndarray]) -> None:
+        """Free the blocks of ``zeros`` arrays other than ``keep``, such as those a grown store replaced."""
+        retired = [block for array, block in self.arrays if not any(array is kept for kept in keep)]
+        self.arrays = [(array, block) for array, block in self.arrays if any(array is kept for kept in keep)]
+        for block in retired:
+            block.unlink()
+        still_mapped = []
+        for block in self.retired + retired:
+            try:
+                block.close()
+            except BufferError:
+                still_mapped.append(block)
+        self.retired = still_mapped
+
+    def close(self) -> None:
+        self.release([])
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+
+# Blocks a worker process has attached to, by shared-memory name.
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def attach(layout: Layout) -> Dict[str, np.ndarray]:
+    """Views of the arrays described by ``layout``, attaching blocks as needed."""
+    names = {name for name, _, _ in layout.values()}
+    for name in list(_attached):
+        if name not in names:
+            _attached.pop(name).close()
+
+    arrays = {}
+    for key, (name, shape, dtype) in layout.items():
+        block = _attached.get(name)
+        if block is None:
+            block = _attached[name] = _open(name)
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return arrays
+
+
+def _open(name: str) -> shared_memory.SharedMemory:
+    # The coordinator owns and unlinks the blocks. Workers share its resource
+    # tracker, so registering a block again there is harmless, but newer
+    # Pythons let us skip it.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _store(arrays: Dict[str, np.ndarray], size: int) -> SimpleNamespace:
+    return SimpleNamespace(**{name: arrays[name][:size] for name in WorkerPool.store_fields})
+
+
+def _propose_part(task: tuple) -> Tuple[np.ndarray, ...]:
+    layout, size, lo, hi, top, growth_energy = task
+    arrays = attach(layout)
+    return propose_growth(_store(arrays, size), arrays['occupied'], arrays['ids'], arrays['genomes'], top,
+                          growth_energy, (arrays['cells'][lo:hi], arrays['index'][lo:hi]))
+
+
+def _energy_part(task: tuple) -> Tuple[np.ndarray, ...]:
+    layout, size, lo, hi, sun_level = task
+    arrays = attach(layout)
+    return collect_energy(_store(arrays, size), arrays['occupied'], arrays['ids'], sun_level,
+                          (arrays['cells'][lo:hi], arrays['index'][lo:hi]))
+
+
+class WorkerPool:
+    """Process pool that runs the read-only halves of a step in parallel.
+
+    ``adopt`` moves a grid's occupancy and cell store into shared memory,
+    where they stay: cells added later are allocated there too, so the
+    workers read the live world in place. ``propose_growth`` and
+    ``collect_energy`` take the arguments of the functions in ``engine``.
+    The calling process finds the trees' cells once with ``owned_cells``
+    and gives each worker an equal range of them; the results are merged
+    back into exactly what the serial call returns, whatever the number of
+    workers.
+
+    Claim resolution, growth and the tree lifecycle (death, seeds falling
+    and sprouting) work on the ``Tree`` and ``Cell`` objects and stay in the
+    calling process. They take most of a step, so the pool does not make
+    stepping faster; ``benchmark.py`` measures it.
+    """
+
+    store_fields = ('x', 'y', 'state', 'energy', 'gene', 'tree', 'order', 'alive')
+
+    def __init__(self, workers: int) -> None:
+        if workers < 1:
+            raise ValueError(f"need at least one worker, got {workers}")
+        self.workers = workers
+        self.shared = SharedArrays()
+        self.grid = None
+        self.processes = multiprocessing.get_context('spawn').Pool(workers)
+
+    def adopt(self, grid) -> None:
+        """Keep ``grid``'s occupancy and cell store in shared memory; a no-op for the grid already adopted."""
+        if grid is self.grid:
+            return
+        if self.grid is not None:
+            self.grid.move_to(np.zeros)
+        grid.move_to(self.shared.zeros)
+        self.grid = grid
+
+    def propose_growth(self, store, occupied: np.ndarray, ids: np.ndarray, genomes: np.ndarray, top: int,
+                       growth_energy: int) -> Tuple[np.ndarray, ...]:
+        cells, index = owned_cells(store, ids)
+        layout = self._layout(store, occupied, ids=ids, genomes=genomes, cells=cells, index=index)
+        parts = self.processes.map(_propose_part, [(layout, store.size, lo, hi, top, growth_energy)
+                                                   for lo, hi in self.partition(len(cells))])
+
+        offset = 0
+        for part in parts:
+            part[2][...] += offset
+            offset += len(part[0])
+        seeds, index, claim, xs, ys, pointers = (np.concatenate(arrays) for arrays in zip(*parts))
+        # Ranges split trees, so restore the serial (tree, frontier position)
+        # order of the seeds, keeping each seed's claims in direction order.
+        order = np.lexsort((store.order[seeds], index))
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        claim = rank[claim]
+        claims = np.argsort(claim, kind='stable')
+        return seeds[order], index[order], claim[claims], xs[claims], ys[claims], pointers[claims]
+
+    def collect_energy(self, store, occupied: np.ndarray, ids: np.ndarray,
+                       sun_level: int) -> Tuple[np.ndarray, ...]:
+        cells, index = owned_cells(store, ids)
+        layout = self._layout(store, occupied, ids=ids, cells=cells, index=index)
+        parts = self.processes.map(_energy_part, [(layout, store.size, lo, hi, sun_level)
+                                                  for lo, hi in self.partition(len(cells))])
+        cells, energy, last_energy = (np.concatenate(arrays) for arrays in list(zip(*parts))[:3])
+        return cells, energy, last_energy, np.sum([part[3] for part in parts], axis=0, dtype=np.int64)
+
+    def _layout(self, store, occupied: np.ndarray, **arrays: np.ndarray) -> Layout:
+        resident = {name: getattr(store, name) for name in self.store_fields}
+        # Frees the blocks a growing store has moved out of.
+        self.shared.release([getattr(store, name) for name, _ in store.fields] + [occupied])
+        layout = {name: self.shared.describe(values) for name, values in resident.items()}
+        layout['occupied'] = self.shared.describe(occupied)
+        layout.update(self.shared.publish(arrays))
+        return layout
+
+    def partition(self, count: int) -> List[Tuple[int, int]]:
+        """Split ``range(count)`` into up to ``workers`` contiguous ranges of about equal length."""
+        edges = np.linspace(0, count, self.workers + 1).astype(int).tolist()
+        return [(lo, hi) for lo, hi in zip(edges, edges[1:]) if hi > lo] or [(0, 0)]
+
+    def close(self) -> None:
+        self.processes.close()
+        self.processes.join()
+        if self.grid is not None:
+            self.grid.move_to(np.zeros)
+            self.grid = None
+        self.shared.close()
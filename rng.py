@@ -0,0 +1,126 @@
+from typing import List, Sequence, TypeVar, Union
+
+import numpy as np
+
+T = TypeVar('T')
+
+MASK = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+
+# What a stream is for; the first word of every stream key.
+PLACE = 1    # (PLACE, placement number): ground positions for new trees
+BIRTH = 2    # (BIRTH, tree id): a new tree's random genome, color and lifespan
+SPROUT = 3   # (SPROUT, tree id, step, seed order): mutation of one seedling
+
+
+def mix(z: int) -> int:
+    """SplitMix64 finalizer: a bijective scramble of a 64-bit word."""
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+    return z ^ (z >> 31)
+
+
+def mix_array(z: np.ndarray) -> np.ndarray:
+    """``mix`` over an array of ``uint64`` words."""
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def uniform(words: np.ndarray) -> np.ndarray:
+    """``Stream.random`` for an array of drawn words."""
+    return (words >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def integers(words: np.ndarray, a: int, b: int) -> np.ndarray:
+    """``Stream.randint(a, b)`` for an array of drawn words."""
+    return a + ((words >> np.uint64(32)) * np.uint64(b - a + 1) >> np.uint64(32)).astype(np.int64)
+
+
+class Stream:
+    """Counter-based random numbers: the n-th draw is ``mix(key + n * GOLDEN)``.
+
+    This is SplitMix64 started from ``key``. A stream holds no state beyond
+    its key and counter, so streams for different keys never interact and
+    can be created on demand in any process and in any order. The methods
+    mirror the parts of ``random`` the engine uses; integers come from a
+    32-bit multiply-shift so ``integers`` can give the same values in bulk.
+    """
+
+    __slots__ = ('key', 'counter')
+
+    def __init__(self, key: int) -> None:
+        self.key = key
+        self.counter = 0
+
+    def next64(self) -> int:
+        self.counter += 1
+        return mix((self.key + self.counter * GOLDEN) & MASK)
+
+    def random(self) -> float:
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def randint(self, a: int, b: int) -> int:
+        return a + (((self.next64() >> 32) * (b - a + 1)) >> 32)
+
+    def choice(self, seq: Sequence[T]) -> T:
+        return seq[((self.next64() >> 32) * len(seq)) >> 32]
+
+
+class DrawnStream(Stream):
+    """A ``Stream`` that hands out words drawn in advance by ``RandomStreams.block``.
+
+    Draws past the end of the block are computed as usual, so the values are
+    always the ones the plain stream would give.
+    """
+
+    __slots__ = ('words',)
+
+    def __init__(self, key: int, words: List[int]) -> None:
+        super().__init__(key)
+        self.words = words
+
+    def next64(self) -> int:
+        if self.counter < len(self.words):
+            self.counter += 1
+            return self.words[self.counter - 1]
+        return super().next64()
+
+
+class RandomStreams:
+    """Independent streams derived from one simulation seed.
+
+    ``stream(*key)`` hashes the seed and the integer ``key`` words into the
+    start of a ``Stream``. Keys name the entity and moment a draw belongs to
+    (see ``PLACE``, ``BIRTH`` and ``SPROUT``), so a tree's draws do not
+    depend on how many numbers other trees drew before it, on the order
+    trees are visited or on which process does the drawing.
+
+    ``keys`` and ``block`` derive many streams and pre-draw their words with
+    NumPy in one pass; ``uniform`` and ``integers`` turn those words into the
+    values ``Stream.random`` and ``Stream.randint`` would return, and
+    ``DrawnStream`` serves a pre-drawn row to code written for ``Stream``.
+    """
+
+    def __init__(self, seed: int) -> None:
+        self.seed = seed & MASK
+
+    def stream(self, *key: int) -> Stream:
+        state = mix(self.seed ^ GOLDEN)
+        for word in key:
+            state = mix((state + GOLDEN) & MASK ^ (word & MASK))
+        return Stream(state)
+
+    def keys(self, *key: Union[int, np.ndarray]) -> np.ndarray:
+        """Starting states of many streams at once; array words broadcast together."""
+        state = np.array([mix(self.seed ^ GOLDEN)], dtype=np.uint64)
+        for word in key:
+            word = np.atleast_1d(word).astype(np.int64).astype(np.uint64)
+            state = mix_array((state + np.uint64(GOLDEN)) ^ word)
+        return state
+
+    @staticmethod
+    def block(keys: np.ndarray, count: int) -> np.ndarray:
+        """The first ``count`` words of every stream in ``keys``, one row per stream."""
+        counters = np.arange(1, count + 1, dtype=np.uint64) * np.uint64(GOLDEN)
+        return mix_array(keys[:, None] + counters)
@@ -5,4 +5,14 @@ cell_size = 6
 cols = width // cell_size
 rows = height // cell_size
 
-menu_height = 19
\ No newline at end of file
+menu_height = 19
+autosave_dir = 'autosaves'
+autosave_interval = 1000  # steps between background checkpoints
+autosave_keep = 3         # newest checkpoints kept on disk
+
+history_keyframe_every = 100  # steps between full keyframes of the rewind history
+history_budget = 64 << 20     # bytes of rewind history kept in memory
+
+# 'dirty' redraws changed cells only, 'framebuffer' draws the world as an image with NumPy,
+# 'full' draws every cell with its own rectangle each frame
+render_mode = 'dirty'
@@ -0,0 +1,348 @@
+import multiprocessing
+import random
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from engine import Simulation
+from genome import PackedGenome
+from settings import rows, cols, menu_height
+from world import resolve_claims
+
+
+def strip_masks(cols: int, strips: int, halo: int) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Column masks (core, window, shared) for each of ``strips`` strips of a wrap-around world.
+
+    The cores split the columns into contiguous strips. A strip's window is
+    its core widened by ``halo`` columns on both sides, wrapping around the
+    world's edge, and its shared columns are the part of the window that
+    lies in some other strip's window too.
+    """
+    bounds = np.linspace(0, cols, strips + 1).astype(int)
+    columns = np.arange(cols)
+    cores, windows = [], []
+    for start, stop in zip(bounds, bounds[1:]):
+        cores.append((columns >= start) & (columns < stop))
+        windows.append((columns - start + halo) % cols < stop - start + 2 * halo)
+    return list(zip(cores, windows, shared_columns(windows)))
+
+
+def shared_columns(windows: List[np.ndarray]) -> List[np.ndarray]:
+    """The part of each window that lies in some other window too."""
+    coverage = np.sum(windows, axis=0)
+    return [window & (coverage > 1) for window in windows]
+
+
+class StripSimulation(Simulation):
+    """The trees one strip worker owns, stepped in phases by ``StripWorld``.
+
+    A tree belongs to the strip whose core holds its root, however far it
+    grows. The strip's window is its core widened by ``halo`` columns, plus
+    the columns next to any of its cells at or beyond that edge (see ``reach``), so
+    all of its trees' growth lands inside it. Cells other strips own inside
+    the window are kept as ghosts in the grid. The grid spans the whole
+    world so coordinates stay global, but only the window is ever written.
+    """
+
+    def __init__(self, index: int, strips: int, masks: Tuple[np.ndarray, np.ndarray, np.ndarray], **kwargs) -> None:
+        self.index = index
+        self.strips = strips
+        self.core, self.window, self.shared = masks
+        self.base = self.window
+        # Columns whose neighbours all lie in the base window too.
+        self.interior = self.base & np.roll(self.base, 1) & np.roll(self.base, -1)
+        self.outbox: List[Dict] = []
+        self.reset_ancestral = False
+        self.pending: Tuple[List, List[Tuple]] = ([], [])
+        self.proposals: Optional[Tuple[np.ndarray, ...]] = None
+        super().__init__(step_mode='two_phase', **kwargs)
+
+    def new_tree_id(self) -> int:
+        # Ids stay unique across strips, and priority between strips stays deterministic.
+        self.last_tree_id += 1
+        return self.last_tree_id * self.strips + self.index
+
+    def sprout(self, **tree):
+        if self.core[tree['x']]:
+            return super().sprout(**tree)
+        self.outbox.append(dict(tree, genome=tree['genome'].data))
+        return None
+
+    def check_for_ancestral(self):
+        if self.reset_ancestral:
+            for tree in self.trees:
+                tree.genome.ancestral_color = tree.genome.color
+            self.ancestry_resets += 1
+
+    def band(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of our cells in shared columns, which other strips see as ghosts."""
+        store = self.grid.store
+        cells = store.live()
+        cells = cells[self.shared[store.x[cells]]]
+        return store.x[cells], store.y[cells]
+
+    def reach(self) -> np.ndarray:
+        """Columns of our cells that could grow out of the core's ``halo`` window."""
+        xs = self.grid.store.x[self.grid.store.live()]
+        return np.unique(xs[~self.interior[xs]])
+
+    def retarget(self, window: np.ndarray, shared: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Switch to a new window; returns the band for its shared columns."""
+        self.window, self.shared = window, shared
+        return self.band()
+
+    def plant(self, xs: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Start random trees on the ground at ``xs``; returns the band."""
+        for x in xs:
+            self.add_tree(x=x, y=self.rows - 1)
+        return self.band()
+
+    def propose_phase(self, seedlings: List[Dict], ghosts: Tuple[np.ndarray, np.ndarray],
+                      reset_ancestral: bool) -> Tuple[np.ndarray, ...]:
+        """Start a step and return the claims that other strips could contest.
+
+        Each border claim is given as (tree id, claim index, flat position);
+        sorting by the first two gives the priority a single world would use.
+        """
+        self.grid.set_ghosts(*ghosts)
+        for seedling in seedlings:
+            super().sprout(**dict(seedling, genome=PackedGenome(seedling['genome'])))
+        self.reset_ancestral = reset_ancestral
+        trees, living = self.begin_step()
+        self.pending = (trees, living)
+
+        empty = np.zeros(0, dtype=np.int64)
+        if not living:
+            self.proposals = None
+            return empty, empty, empty
+
+        self.proposals = proposals = self.propose(living)
+        seeds, index, claim, xs, ys, pointers = proposals
+        if not self.window[xs].all():
+            raise RuntimeError(f"strip {self.index}: growth claims fall outside the window")
+        border = np.flatnonzero(self.shared[xs])
+        ids = self.grid.store.tree[seeds[claim[border]]].astype(np.int64)
+        return ids, border, ys[border] * self.cols + xs[border]
+
+    def grow_phase(self, won: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Apply the won border claims and the strip's own claims; returns the new band."""
+        if self.proposals is not None:
+            xs, ys = self.proposals[3], self.proposals[4]
+            local = np.flatnonzero(~self.shared[xs])
+            local = local[resolve_claims(ys[local] * self.cols + xs[local])]
+            self.apply_growth(self.proposals, np.sort(np.concatenate([local, won])))
+            self.proposals = None
+        return self.band()
+
+    def live_phase(self, ghosts: Tuple[np.ndarray, np.ndarray]) -> Dict:
+        """Collect energy and run the lifecycle; returns what the coordinator needs."""
+        self.grid.set_ghosts(*ghosts)
+        trees, living = self.pending
+        self.update_energy(living)
+        self.finish_step(trees)
+        self.steps += 1
+        if self.check_grid:
+            self.verify_cell_grid()
+
+        outbox, self.outbox = self.outbox, []
+        colors = {tree.genome.ancestral_color for tree in self.trees}
+        colors.update(seedling['ancestral_color'] for seedling in outbox)
+        return {
+            'seedlings': outbox,
+            'band': self.band(),
+            'reach': self.reach(),
+            'colors': list(colors)[:2],
+            'trees': len(self.trees),
+            'cells': len(self.grid),
+            'generation': self.generation,
+        }
+
+    def cell_arrays(self) -> Dict[str, np.ndarray]:
+        store = self.grid.store
+        cells = store.live()
+        return {name: getattr(store, name)[cells] for name in ('x', 'y', 'tree', 'state', 'energy')}
+
+
+def _strip_worker(connection, index: int, strips: int, masks, options: Dict, seed: int) -> None:
+    random.seed(seed)
+    check_grid = options.pop('check_grid')
+    simulation = StripSimulation(index, strips, masks, **options)
+    simulation.check_grid = check_grid
+    phases = {
+        'plant': simulation.plant,
+        'propose': simulation.propose_phase,
+        'grow': simulation.grow_phase,
+        'live': simulation.live_phase,
+        'retarget': simulation.retarget,
+        'cells': simulation.cell_arrays,
+    }
+    while True:
+        command, args = connection.recv()
+        if command == 'close':
+            connection.close()
+            return
+        else:
+            connection.send(phases[command](*args))
+
+
+class StripWorld:
+    """A wrap-around world split into column strips run by separate processes.
+
+    Every step takes three rounds of messages. Workers first report growth
+    claims in shared columns, which are resolved here by (tree id, claim)
+    priority so two strips never grow into the same position. After growth
+    and again after the lifecycle, each worker sends the cells it has in
+    shared columns and gets back the ghosts inside its window (the halo
+    exchange). Seedlings whose root lands in another strip's core are handed
+    to that strip at the start of the next step.
+
+    Trees stay with the strip that holds their root. When one grows past
+    the ``halo`` columns, its strip's window is widened to follow it, and
+    every worker is sent its new window and shared columns before the next
+    step, so no growth is ever lost at a border: the world grows as it
+    would with windows covering all columns. A wider ``halo`` means more
+    shared columns to exchange but fewer window changes, each of which
+    costs an extra round of messages.
+
+    Per-step work in a worker depends on the trees it owns, not on the width
+    of the world, so wide worlds keep their step rate by adding strips. Each
+    worker keeps a dense grid of the full width, about 17 bytes per position.
+    """
+
+    def __init__(self, started_tree: int = None, strips: int = 2, halo: int = 16, rows: int = rows,
+                 cols: int = cols, top: int = menu_height, seed: int = None, check_grid: bool = False) -> None:
+        if strips < 1 or cols < strips:
+            raise ValueError(f"cannot split {cols} columns into {strips} strips")
+
+        self.rows = rows
+        self.cols = cols
+        self.strips = strips
+        self.steps = 0
+        self.trees = 0
+        self.cells = 0
+        self.generation = 0
+        self.random = random.Random(seed)
+        self.masks = strip_masks(cols, strips, halo)
+        self.bases = [window for _, window, _ in self.masks]
+        self.owner = np.argmax([core for core, _, _ in self.masks], axis=0)
+        self.seedlings: List[List[Dict]] = [[] for _ in range(strips)]
+        self.reset_ancestral = False
+
+        context = multiprocessing.get_context('spawn')
+        options = {'rows': rows, 'cols': cols, 'top': top, 'check_grid': check_grid}
+        self.connections = []
+        self.processes = []
+        for index in range(strips):
+            parent, child = context.Pipe()
+            process = context.Process(target=_strip_worker, daemon=True,
+                                      args=(child, index, strips, self.masks[index], dict(options),
+                                            self.random.getrandbits(64)))
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+        planted = [[] for _ in range(strips)]
+        if started_tree:
+            for x in self.random.sample(range(5, cols), min(started_tree, cols - 5)):
+                planted[self.owner[x]].append(x)
+        self.bands = self._exchange('plant', [(xs,) for xs in planted])
+        self.trees = sum(map(len, planted))
+        self.cells = self.trees
+
+    def step(self, n: int = 1) -> None:
+        for _ in range(n):
+            ghosts = self._ghosts(self.bands, self.seedlings)
+            claims = self._exchange('propose', [(self.seedlings[i], ghosts[i], self.reset_ancestral)
+                                                for i in range(self.strips)])
+            won = self.resolve_border(claims)
+            bands = self._exchange('grow', [(won[i],) for i in range(self.strips)])
+            reports = self._exchange('live', [(ghost,) for ghost in self._ghosts(bands)])
+
+            self.bands = [report['band'] for report in reports]
+            self.follow([report['reach'] for report in reports])
+            self.seedlings = [[] for _ in range(self.strips)]
+            colors = set()
+            for report in reports:
+                for seedling in report['seedlings']:
+                    self.seedlings[self.owner[seedling['x']]].append(seedling)
+                colors.update(report['colors'])
+
+            self.trees = sum(report['trees'] for report in reports) + sum(map(len, self.seedlings))
+            self.cells = sum(report['cells'] for report in reports)
+            self.generation = sum(report['generation'] for report in reports)
+            self.reset_ancestral = self.trees > 1 and len(colors) == 1
+            self.steps += 1
+
+    def follow(self, reaches: List[np.ndarray]) -> None:
+        """Widen each window to cover the growth of its strip's cells at the halo's edge (see ``StripSimulation.reach``)."""
+        windows = []
+        for base, reach in zip(self.bases, reaches):
+            window = base.copy()
+            for offset in (-1, 0, 1):
+                window[(reach + offset) % self.cols] = True
+            windows.append(window)
+        if all(np.array_equal(window, old) for window, (_, old, _) in zip(windows, self.masks)):
+            return
+
+        shared = shared_columns(windows)
+        self.masks = [(core, window, columns) for (core, _, _), window, columns in zip(self.masks, windows, shared)]
+        self.bands = self._exchange('retarget', list(zip(windows, shared)))
+
+    def resolve_border(self, claims: List[Tuple[np.ndarray, ...]]) -> List[np.ndarray]:
+        """Winning border claims of each strip, as indices into its own claims."""
+        strip = np.concatenate([np.full(len(ids), i) for i, (ids, _, _) in enumerate(claims)])
+        ids, local, positions = (np.concatenate(parts) for parts in zip(*claims))
+        order = np.lexsort((local, ids))
+        winners = order[resolve_claims(positions[order])]
+        return [np.sort(local[winners[strip[winners] == i]]) for i in range(self.strips)]
+
+    def _ghosts(self, bands: List[Tuple[np.ndarray, np.ndarray]],
+                seedlings: List[List[Dict]] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """For each strip, the cells of the other strips inside its window."""
+        ghosts = []
+        for i, (_, window, _) in enumerate(self.masks):
+            xs = [band[0] for j, band in enumerate(bands) if j != i]
+            ys = [band[1] for j, band in enumerate(bands) if j != i]
+            if seedlings:
+                for j, arriving in enumerate(seedlings):
+                    if j != i and arriving:
+                        xs.append(np.array([seedling['x'] for seedling in arriving]))
+                        ys.append(np.array([seedling['y'] for seedling in arriving]))
+            xs, ys = np.concatenate(xs or [[]]).astype(np.intp), np.concatenate(ys or [[]]).astype(np.intp)
+            inside = window[xs]
+            ghosts.append((xs[inside], ys[inside]))
+        return ghosts
+
+    def _exchange(self, command: str, args: List[tuple]) -> list:
+        for connection, arg in zip(self.connections, args):
+            connection.send((command, arg))
+        return [connection.recv() for connection in self.connections]
+
+    def cell_arrays(self) -> Dict[str, np.ndarray]:
+        """Every cell of the world as arrays of x, y, tree id, state and energy."""
+        parts = self._exchange('cells', [()] * self.strips)
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    def owner_grid(self) -> np.ndarray:
+        """``rows x cols`` tree ids (-1 where empty); fails if two strips claim one position."""
+        cells = self.cell_arrays()
+        grid = np.full((self.rows, self.cols), -1, dtype=np.int32)
+        if len(np.unique(cells['y'].astype(np.int64) * self.cols + cells['x'])) != len(cells['x']):
+            raise RuntimeError("strips disagree: a position is held by more than one cell")
+        grid[cells['y'], cells['x']] = cells['tree']
+        return grid
+
+    def close(self) -> None:
+        for connection in self.connections:
+            connection.send(('close', ()))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self) -> 'StripWorld':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -347,6 +347,15 @@ class TreeDetailsWindow:
 
 
 class UI:
+    """The menu bar.
+
+    Everything that does not change while the window is open (the field,
+    button frames, labels) is drawn once onto ``background`` and blitted
+    each frame; ``draw_controls`` then adds the parts that follow the
+    simulation. The background is redrawn when the window size, the cell
+    size or the colors change.
+    """
+
     def __init__(self, simulation: 'Simulation') -> None:
         self.simulation = simulation
         self.pause_button_rect = pygame.Rect(1200, 40, 40, 40)
@@ -355,17 +364,46 @@ class UI:
         self.load_button_rect = pygame.Rect(480, 60, 90, 40)
         self.radio_x = 200
         self.font = pygame.font.SysFont('Arial', 20)
+        self.small_font = pygame.font.SysFont('Arial', 16)
+        self.generation_font = pygame.font.SysFont('Arial', 21)
         self.icon_color = (94, 149, 95)
         self.bg_color = (66, 66, 66)
+        self.field_color = (36, 36, 36)
+        self.background = None
+        self.background_key = None
 
     def draw_button(self, screen, rect, text, offset_x=0, offset_y=0) -> None:
         pygame.draw.rect(screen, self.bg_color, rect, 2)
         rendered_text = self.font.render(text, True, self.icon_color)
         screen.blit(rendered_text, (rect.x + offset_x, rect.y + offset_y))
 
-    def draw_pause_button(self) -> None:
-        pygame.draw.rect(screen, self.bg_color, self.pause_button_rect, 2)
+    def draw_background(self, area: pygame.Rect = None) -> None:
+        """Blit the cached background, or just the ``area`` part of it."""
+        key = (screen.get_size(), cell_size, menu_height, self.field_color, self.bg_color, self.icon_color)
+        if key != self.background_key:
+            self.background = pygame.Surface(screen.get_size())
+            self.draw_field(self.background)
+            self.draw_chrome(self.background)
+            self.background_key = key
+        if area is None:
+            screen.blit(self.background, (0, 0))
+        else:
+            screen.blit(self.background, area, area)
+
+    def draw_field(self, surface: pygame.Surface) -> None:
+        surface.fill((0, 0, 0))
+        surface.fill(self.field_color, (0, 0, cols * cell_size, menu_height * cell_size))
+
+    def draw_chrome(self, surface: pygame.Surface) -> None:
+        pygame.draw.rect(surface, self.bg_color, self.pause_button_rect, 2)
+        self.draw_exit_button(surface)
+        self.draw_buttons(surface)
+        self.draw_speed_buttons(surface)
+        self.draw_sun_level_buttons(surface)
+        self.draw_radio_labels(surface)
+        surface.blit(self.generation_font.render("generation", True, self.icon_color), (40, 40))
 
+    def draw_pause_button(self) -> None:
         if self.simulation.paused:
             pygame.draw.rect(screen, self.icon_color, pygame.Rect(self.pause_button_rect.x + 13.5,
                                                                   self.pause_button_rect.y + 10, 5, 20))
@@ -379,72 +417,64 @@ class UI:
             ]
             pygame.draw.polygon(screen, self.icon_color, points)
     
-    def draw_exit_button(self) -> None:
-        pygame.draw.rect(screen, self.bg_color, self.exit_button_rect, 2)
-
+    def draw_exit_button(self, surface: pygame.Surface) -> None:
         center_x = self.exit_button_rect.x + self.exit_button_rect.width // 2
         center_y = self.exit_button_rect.y + self.exit_button_rect.height // 2
 
-        pygame.draw.line(screen, self.icon_color,
+        pygame.draw.line(surface, self.icon_color,
                         (center_x - 10, center_y - 10),
                         (center_x + 10, center_y + 10), 3)
-        pygame.draw.line(screen, self.icon_color,
+        pygame.draw.line(surface, self.icon_color,
                         (center_x - 10, center_y + 10),
                         (center_x + 10, center_y - 10), 3)
 
-        pygame.draw.rect(screen, self.bg_color, self.exit_button_rect, 2)
-        
-    def draw_radio_buttons(self) -> None:
+        pygame.draw.rect(surface, self.bg_color, self.exit_button_rect, 2)
+
+    def draw_radio_labels(self, surface: pygame.Surface) -> None:
         options = ['Normal', 'Energy', 'Family']
         for i, option in enumerate(options):
             y_pos = 30 + (i * 30)
-            pygame.draw.circle(screen, self.bg_color, (self.radio_x, y_pos), 10, 1)
-
-            if self.simulation.display_mode == option.lower():
-                pygame.draw.circle(screen, self.icon_color, (self.radio_x, y_pos), 5)
-
+            pygame.draw.circle(surface, self.bg_color, (self.radio_x, y_pos), 10, 1)
             label_text = self.font.render(option, True, self.icon_color)
-            screen.blit(label_text, (self.radio_x + 20, y_pos - 10))
+            surface.blit(label_text, (self.radio_x + 20, y_pos - 10))
 
-    def draw_generation(self) -> None:
-        font = pygame.font.SysFont('Arial', 21)
-        generation_label = font.render("generation", True, self.icon_color)
-        generation_number = font.render(f"{self.simulation.generation}", True, self.icon_color)
+    def draw_radio_buttons(self) -> None:
+        options = ['normal', 'energy', 'family']
+        y_pos = 30 + options.index(self.simulation.display_mode) * 30
+        pygame.draw.circle(screen, self.icon_color, (self.radio_x, y_pos), 5)
 
-        screen.blit(generation_label, (40, 40))
+    def draw_generation(self) -> None:
+        generation_number = self.generation_font.render(f"{self.simulation.generation}", True, self.icon_color)
         screen.blit(generation_number, (50, 70))
 
-    def draw_buttons(self) -> None:
-        self.draw_button(screen, self.save_button_rect, "Save", 23, 10)
-        self.draw_button(screen, self.load_button_rect, "Load", 23, 10)
+    def draw_buttons(self, surface: pygame.Surface) -> None:
+        self.draw_button(surface, self.save_button_rect, "Save", 23, 10)
+        self.draw_button(surface, self.load_button_rect, "Load", 23, 10)
+
+    def draw_speed_buttons(self, surface: pygame.Surface) -> None:
+        self.draw_button(surface, pygame.Rect(300, 60, 40, 40), "-", 18, 10)
+        self.draw_button(surface, pygame.Rect(430, 60, 40, 40), "+", 15, 10)
 
-    def draw_speed_buttons(self) -> None:
-        font = pygame.font.SysFont('Arial', 16)
-        self.draw_button(screen, pygame.Rect(300, 60, 40, 40), "-", 18, 10)
-        speed_text = font.render(f'Speed: {(500-self.simulation.simulation_speed)/100}', True, self.icon_color)
+    def draw_speed(self) -> None:
+        speed_text = self.small_font.render(f'Speed: {(500-self.simulation.simulation_speed)/100}', True, self.icon_color)
         screen.blit(speed_text, (345, 70))
-        self.draw_button(screen, pygame.Rect(430, 60, 40, 40), "+", 15, 10)
 
-    def draw_sun_level_buttons(self) -> None:
-        font = pygame.font.SysFont('Arial', 16)
-        self.draw_button(screen, pygame.Rect(300, 10, 40, 40), "-", 18, 10)
-        sun_text = font.render(f'Sun: {self.simulation.sun_level}', True, self.icon_color)
-        screen.blit(sun_text, (362 if self.simulation.sun_level < 10 else 359, 20))
-        self.draw_button(screen, pygame.Rect(430, 10, 40, 40), "+", 15, 10)
+    def draw_sun_level_buttons(self, surface: pygame.Surface) -> None:
+        self.draw_button(surface, pygame.Rect(300, 10, 40, 40), "-", 18, 10)
+        self.draw_button(surface, pygame.Rect(430, 10, 40, 40), "+", 15, 10)
 
-    def draw_field(self) -> None:
-        for row in range(rows):
-            for col in range(cols):
-                color = (36, 36, 36) if row < menu_height else (0, 0, 0)
-                pygame.draw.rect(screen, color, (col * cell_size, row * cell_size, cell_size, cell_size), 1 if row >= 19 else 0)
+    def draw_sun_level(self) -> None:
+        sun_text = self.small_font.render(f'Sun: {self.simulation.sun_level}', True, self.icon_color)
+        screen.blit(sun_text, (362 if self.simulation.sun_level < 10 else 359, 20))
 
     def draw(self) -> None:
-        self.draw_field()
+        self.draw_background()
+        self.draw_controls()
+
+    def draw_controls(self) -> None:
         self.draw_pause_button()
-        self.draw_exit_button()
-        self.draw_buttons()
-        self.draw_speed_buttons()
-        self.draw_sun_level_buttons()
+        self.draw_speed()
+        self.draw_sun_level()
         self.draw_radio_buttons()
         self.draw_generation()
 
@@ -546,6 +576,8 @@ class Simulation:
         self.simulation_speed = 100
         self.sun_level = 6
         self.ui = UI(self)
+        self.soil = pygame.Surface((cols * cell_size, cell_size))
+        self.soil_colors = [None] * cols
         self.cell_grid = {}
         self.occupied_positions = set()
 
@@ -637,19 +669,26 @@ class Simulation:
             self.add_tree(genome=genome, x=selected_cell[0], y=selected_cell[1])  
 
     def draw_soil(self):
+        """Blit the soil strip, repainting only the blocks whose color changed.
+
+        Blocks keep the one-pixel black border the field's cell outlines give them.
+        """
         for i in range(cols):
             color = self.soil_blocks[i].get_color()
-            pygame.draw.rect(screen, color, (i * cell_size, (rows - 1) * cell_size, cell_size, cell_size))
+            if color != self.soil_colors[i]:
+                self.soil_colors[i] = color
+                self.soil.fill((0, 0, 0), (i * cell_size, 0, cell_size, cell_size))
+                self.soil.fill(color, (i * cell_size + 1, 1, cell_size - 2, cell_size - 2))
+        screen.blit(self.soil, (0, (rows - 1) * cell_size))
 
     def run(self):
         event_handler = EventHandler(self)
 
         while self.running:
-            screen.fill((0, 0, 0))
             event_handler.handle_events()
             self.update_cell_grid()
-            self.draw_soil()
             self.ui.draw()
+            self.draw_soil()
 
             for cell in self.cell_grid.values():
                 if self.display_mode == 'normal':
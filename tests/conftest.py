@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.fixture
+def world():
+    """A function giving everything a step can change, in a form that compares with ``==``."""
+    def describe(simulation):
+        grid = simulation.grid
+        trees = [(tree.id, tree.state, tree.energy, tree.age, [(cell.x, cell.y) for cell in tree.cells])
+                 for tree in simulation.trees]
+        return (simulation.steps, simulation.generation, trees,
+                grid.owner.tolist(), grid.state.tolist(), grid.energy.tolist())
+    return describe
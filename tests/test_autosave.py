@@ -0,0 +1,19 @@
+import os
+
+from autosave import Autosaver
+from engine import Simulation
+
+
+def test_prune_keeps_the_latest_saves_after_a_rewind(tmp_path):
+    directory = str(tmp_path / 'autosaves')
+    simulation = Simulation(started_tree=10, seed=1)
+    autosaver = Autosaver(simulation, directory, interval=10, keep=2, fork=False)
+    assert not os.path.exists(directory)
+
+    for steps in (20, 30, 5):
+        simulation.steps = steps
+        autosaver.save()
+        autosaver.close()
+    assert [os.path.basename(path) for path in autosaver.checkpoints()] == \
+        ['world-0000000030.npz', 'world-0000000005.npz']
+    assert autosaver.latest().endswith('world-0000000005.npz')
@@ -0,0 +1,16 @@
+import checkpoint
+from engine import Simulation
+
+
+def test_resume_continues_the_run(tmp_path, world):
+    path = str(tmp_path / 'world.npz')
+    for seed in (1, -5, 1 << 64):
+        original = Simulation(started_tree=40, seed=seed)
+        original.step(200)
+        checkpoint.save(original, path)
+        original.step(200)
+
+        resumed = checkpoint.load(path)
+        assert resumed.rng.seed == original.rng.seed
+        resumed.step(200)
+        assert world(resumed) == world(original)
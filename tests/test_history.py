@@ -0,0 +1,15 @@
+from engine import Simulation
+from history import History
+
+
+def test_rewind_then_replay_reproduces_the_run(world):
+    for seed in (1, -5):
+        simulation = Simulation(started_tree=40, seed=seed)
+        history = History(simulation, keyframe_every=50)
+        simulation.step(300)
+        expected = world(simulation)
+
+        history.rewind(130)
+        assert simulation.steps == 130
+        simulation.step(170)
+        assert world(simulation) == expected
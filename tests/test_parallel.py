@@ -0,0 +1,26 @@
+import numpy as np
+
+from engine import Simulation, Tree, collect_energy, genome_table, propose_growth
+from parallel import WorkerPool
+
+
+def test_pool_calls_match_serial_calls():
+    simulation = Simulation(started_tree=40, seed=1)
+    simulation.step(300)
+    grid, trees = simulation.grid, simulation.trees
+    ids = np.array([tree.id for tree in trees], dtype=np.int32)
+    genomes = genome_table(trees)
+    expected = (propose_growth(grid.store, grid.occupied, ids, genomes, simulation.top, Tree.growth_energy),
+                collect_energy(grid.store, grid.occupied, ids, simulation.sun_level))
+
+    pool = WorkerPool(3)
+    try:
+        pool.adopt(grid)
+        got = (pool.propose_growth(grid.store, grid.occupied, ids, genomes, simulation.top, Tree.growth_energy),
+               pool.collect_energy(grid.store, grid.occupied, ids, simulation.sun_level))
+    finally:
+        pool.close()
+
+    for expected_arrays, got_arrays in zip(expected, got):
+        for expected_array, got_array in zip(expected_arrays, got_arrays):
+            assert np.array_equal(expected_array, got_array)
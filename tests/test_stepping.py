@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+
+from engine import Simulation
+
+
+def test_two_phase_matches_sequential(world):
+    sequential = Simulation(started_tree=40, seed=1, step_mode='sequential')
+    two_phase = Simulation(started_tree=40, seed=1, step_mode='two_phase')
+    for _ in range(6):
+        sequential.step(50)
+        two_phase.step(50)
+        assert world(two_phase) == world(sequential)
+
+
+def test_two_phase_growth_ignores_tree_order(world):
+    ordered = Simulation(started_tree=40, seed=2, step_mode='two_phase')
+    shuffled = Simulation(started_tree=40, seed=2, step_mode='two_phase')
+    ordered.step(200)
+    shuffled.step(200)
+    trees = list(shuffled.trees)
+    random.Random(0).shuffle(trees)
+    ordered.grow(list(ordered.trees))
+    shuffled.grow(trees)
+    assert world(shuffled) == world(ordered)
+
+
+def test_change_sets_mirror_the_grid():
+    for step_mode in Simulation.step_modes:
+        simulation = Simulation(started_tree=40, seed=3, step_mode=step_mode)
+        simulation.step(100)
+        owner, state = simulation.grid.owner.copy(), simulation.grid.state.copy()
+        for changes in simulation.iter_steps(300):
+            moved_owner = owner[changes.moved[:, 1], changes.moved[:, 0]]
+            moved_state = state[changes.moved[:, 1], changes.moved[:, 0]]
+            for xs, ys in ((changes.removed[:, 0], changes.removed[:, 1]),
+                           (changes.moved[:, 0], changes.moved[:, 1])):
+                owner[ys, xs] = -1
+                state[ys, xs] = 0
+            owner[changes.moved[:, 3], changes.moved[:, 2]] = moved_owner
+            state[changes.moved[:, 3], changes.moved[:, 2]] = moved_state
+            owner[changes.added[:, 1], changes.added[:, 0]] = changes.added[:, 2]
+            state[changes.added[:, 1], changes.added[:, 0]] = 0
+            state[changes.changed[:, 1], changes.changed[:, 0]] = changes.changed[:, 2]
+
+            assert np.array_equal(owner, simulation.grid.owner)
+            assert np.array_equal(state, simulation.grid.state)
+        assert simulation.grid.changes == []
+
+
+def test_pooled_stepping_matches_serial(world):
+    serial = Simulation(started_tree=40, seed=1, step_mode='two_phase')
+    serial.step(200)
+    for workers in (1, 2):
+        with Simulation(started_tree=40, seed=1, workers=workers) as pooled:
+            pooled.step(200)
+            assert world(pooled) == world(serial)
+
+
+def test_seeded_runs_ignore_the_global_random_state(world):
+    worlds = []
+    for state in (0, 1):
+        random.seed(state)
+        simulation = Simulation(started_tree=40, seed=7)
+        simulation.step(200)
+        worlds.append(world(simulation))
+    assert worlds[0] == worlds[1]
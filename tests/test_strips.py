@@ -0,0 +1,12 @@
+import numpy as np
+
+from strips import StripWorld
+
+
+def test_narrow_halo_grows_like_windows_covering_the_world():
+    grids = []
+    for halo in (1, 200):
+        with StripWorld(started_tree=30, strips=3, halo=halo, cols=200, seed=5, check_grid=True) as world:
+            world.step(300)
+            grids.append(world.owner_grid())
+    assert np.array_equal(grids[0], grids[1])
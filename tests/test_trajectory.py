@@ -0,0 +1,36 @@
+import numpy as np
+
+from engine import Simulation
+from trajectory import Recorder, Trajectory
+
+
+def test_frames_match_the_world_while_recording(tmp_path):
+    path = str(tmp_path / 'run.traj')
+    simulation = Simulation(started_tree=40, seed=1)
+    simulation.step(50)
+    recorder = Recorder(simulation, path, every=2, batch=3)
+    worlds = []
+    for _ in range(39):
+        if worlds:
+            simulation.step()
+        if (simulation.steps - recorder.start) % 2 == 0:
+            grid = simulation.grid
+            colors = {tree.id: tree.genome.color for tree in simulation.trees}
+            worlds.append((simulation.steps, grid.owner.copy(), grid.state, grid.energy, colors))
+
+    trajectory = Trajectory(path)
+    assert 0 < len(trajectory) < len(worlds)
+    recorder.flush()
+    assert len(trajectory) == len(worlds)
+    recorder.close()
+
+    for index, (step, owner, state, energy, colors) in enumerate(worlds):
+        frame = trajectory[index]
+        planes = trajectory.planes(frame)
+        occupied = owner >= 0
+        assert frame['step'] == step
+        assert np.array_equal(planes['owner'], owner)
+        assert np.array_equal(planes['state'][occupied], state[occupied])
+        assert np.array_equal(planes['energy'][occupied], energy[occupied])
+        color, _ = trajectory.colors(frame)
+        assert color.tolist() == [list(colors[tree]) for tree in trajectory.cells(frame)['owner']]
@@ -0,0 +1,295 @@
+"""Trajectories: the world at every step of a run, recorded to memory-mapped files.
+
+    python trajectory.py run.traj           # print what a recording holds
+
+A recording is a file of fixed-size frame records, one per recorded step,
+so frame ``i`` sits at a known offset and reading it is a slice of the
+mapping with no parsing. A frame holds the step, generation and sun level
+and points at a run of cell records in ``<path>.cells``: one per occupied
+position, with its x, y, owning tree id, state, ``energy`` and
+``last_energy``, 13 bytes each. Those are again a slice of a mapping.
+
+Every cell's energy changes every step, so a frame lists all cells rather
+than the changes since the last one, and no frame depends on another.
+Frames grow with the population, not with the world: a 660-column world
+with 300 trees (about 2,000 cells) takes about 25 KB per step. Recording
+slows stepping by about 3-5% with 300 trees on the 220- and 660-column
+worlds and by under 3% with 1,000 trees on a 2000-column one.
+``Recorder(every=k)`` keeps only every k-th step.
+
+Tree colors go to a third file, ``<path>.trees``: one record per tree, in
+the order trees were born, which is also increasing id order. Each frame
+stores how many of those records existed when it was written.
+
+All files are only ever appended to, and the header's record count is
+updated after the records themselves, so a ``Trajectory`` can map and
+follow a recording that is still being written.
+"""
+import sys
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from engine import Simulation
+
+VERSION = 3
+MAGIC = b'TREETRAJ'
+
+HEADER = np.dtype({
+    'names': ['magic', 'version', 'rows', 'cols', 'itemsize', 'count'],
+    'formats': ['S8', '<u4', '<u4', '<u4', '<u4', '<u8'],
+    'offsets': [0, 8, 12, 16, 20, 24],
+    'itemsize': 64,
+})
+
+# Energies are stored as 16-bit values, saturating here; cells rarely hold more than 100.
+ENERGY_MAX = np.iinfo(np.int16).max
+
+TREE = np.dtype([('id', '<i8'), ('color', 'u1', 3), ('ancestral', 'u1', 3)], align=True)
+
+FRAME = np.dtype([
+    ('step', '<i8'),
+    ('generation', '<i8'),
+    ('trees', '<i8'),         # tree records written so far
+    ('reset_trees', '<i8'),   # tree records written before the last ancestry reset
+    ('first', '<i8'),         # the frame's first record in the cells file
+    ('cells', '<i8'),         # and how many it has
+    ('sun_level', '<i4'),
+], align=True)
+
+CELL = np.dtype([('x', '<u2'), ('y', '<u2'), ('owner', '<i4'), ('energy', '<i2'), ('last_energy', '<i2'),
+                 ('state', 'i1')])
+
+
+class _Appender:
+    """Writing side of a header plus fixed-size records.
+
+    Records are written with plain file writes at the end of the file, then
+    the header count is bumped. Readers map the same pages, so they see a
+    record as soon as the count says it is there.
+    """
+
+    def __init__(self, path: str, dtype: np.dtype, rows: int = 0, cols: int = 0) -> None:
+        self.dtype = dtype
+        self.count = 0
+        self.file = open(path, 'w+b', buffering=0)
+        header = np.zeros((), HEADER)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['rows'] = rows
+        header['cols'] = cols
+        header['itemsize'] = dtype.itemsize
+        self.file.write(header.tobytes())
+
+    def append(self, parts: Sequence, count: int = 1) -> None:
+        """Write ``count`` records given as consecutive pieces of their bytes."""
+        self.file.seek(HEADER.itemsize + self.count * self.dtype.itemsize)
+        for part in parts:
+            self.file.write(part)
+        self.count += count
+        self.file.seek(HEADER.fields['count'][1])
+        self.file.write(np.uint64(self.count).tobytes())
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class _Mapped:
+    """Reading side of an ``_Appender`` file, remapped when the writer outgrows it."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._map()
+        header = self.header
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            raise ValueError(f"{path}: not a version {VERSION} trajectory file")
+        self.rows = int(header['rows'])
+        self.cols = int(header['cols'])
+        self.itemsize = int(header['itemsize'])
+
+    def _map(self) -> None:
+        self.raw = np.memmap(self.path, dtype=np.uint8, mode='r')
+        self.header = self.raw[:HEADER.itemsize].view(HEADER)[0]
+
+    def __len__(self) -> int:
+        return int(self.header['count'])
+
+    def records(self, dtype: np.dtype, count: int) -> np.ndarray:
+        end = HEADER.itemsize + count * self.itemsize
+        if end > len(self.raw):
+            self._map()
+        return self.raw[HEADER.itemsize:end].view(dtype)
+
+
+class Recorder:
+    """Appends a frame of ``simulation`` to ``path`` after every ``every``-th step.
+
+    The recorder hooks itself into ``simulation.step`` and takes the
+    current state straight away, so the first frame is the world it was
+    started on. Frames are kept in memory and written ``batch`` at a time,
+    which saves most of the file writes; ``flush`` writes them early, for
+    example before reading a recording that is still being made. ``close``
+    flushes and detaches the recorder.
+    """
+
+    def __init__(self, simulation: Simulation, path: str, every: int = 1, batch: int = 16) -> None:
+        if every < 1 or batch < 1:
+            raise ValueError(f"every and batch must be at least 1, got {every} and {batch}")
+        self.simulation = simulation
+        self.path = path
+        self.every = every
+        self.batch = batch
+        self.start = simulation.steps
+        self.frames = _Appender(path, FRAME, simulation.rows, simulation.cols)
+        self.cells = _Appender(path + '.cells', CELL)
+        self.trees = _Appender(path + '.trees', TREE)
+        self.pending: Tuple[List[tuple], List[np.ndarray], List[np.ndarray]] = ([], [], [])
+        self.cell_count = 0
+        self.tree_count = 0
+        self.last_id = -1
+        self.resets = simulation.ancestry_resets
+        self.reset_trees = 0
+        simulation.recorders.append(self)
+        self.write()
+
+    def record(self) -> None:
+        if (self.simulation.steps - self.start) % self.every == 0:
+            self.write()
+
+    def write(self) -> None:
+        simulation = self.simulation
+        if simulation.ancestry_resets != self.resets:
+            # Every tree born so far now has its own color as its family color.
+            self.resets = simulation.ancestry_resets
+            self.reset_trees = self.tree_count
+        self._add_trees()
+
+        grid = simulation.grid
+        store = grid.store
+        slots = store.live()
+        xs, ys = store.x[slots], store.y[slots]
+        # A seedling can sit on its seed; only the cell the grid shows is kept.
+        visible = grid.slot[ys, xs] == slots
+        if not visible.all():
+            slots, xs, ys = slots[visible], xs[visible], ys[visible]
+
+        cells = np.empty(len(slots), CELL)
+        cells['x'] = xs
+        cells['y'] = ys
+        cells['owner'] = store.tree[slots]
+        cells['state'] = store.state[slots]
+        cells['energy'] = np.minimum(store.energy[slots], ENERGY_MAX)
+        cells['last_energy'] = np.minimum(store.last_energy[slots], ENERGY_MAX)
+
+        frames, cell_parts, _ = self.pending
+        frames.append((simulation.steps, simulation.generation, self.tree_count, self.reset_trees,
+                       self.cell_count, len(cells), simulation.sun_level))
+        cell_parts.append(cells)
+        self.cell_count += len(cells)
+        if len(frames) >= self.batch:
+            self.flush()
+
+    def _add_trees(self) -> None:
+        new = []
+        for tree in reversed(self.simulation.trees):
+            if tree.id <= self.last_id:
+                break
+            new.append(tree)
+        if not new:
+            return
+        new.reverse()
+        records = np.array([(tree.id, tree.genome.color, tree.genome.ancestral_color) for tree in new], TREE)
+        self.pending[2].append(records)
+        self.tree_count += len(new)
+        self.last_id = new[-1].id
+
+    def flush(self) -> None:
+        """Write the frames taken so far; the cells and trees they refer to go first."""
+        frames, cells, trees = self.pending
+        if trees:
+            self.trees.append(trees, self.tree_count - self.trees.count)
+        if cells:
+            self.cells.append(cells, self.cell_count - self.cells.count)
+        if frames:
+            self.frames.append((np.array(frames, FRAME),), len(frames))
+        self.pending = ([], [], [])
+
+    def close(self) -> None:
+        if self in self.simulation.recorders:
+            self.simulation.recorders.remove(self)
+        self.flush()
+        self.frames.close()
+        self.cells.close()
+        self.trees.close()
+
+    def __enter__(self) -> 'Recorder':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class Trajectory:
+    """Read-only view of a recording, including one that is still growing.
+
+    ``trajectory[i]`` is frame ``i`` as a NumPy record whose fields are
+    views into the file; ``len`` counts the frames written so far.
+    ``cells(frame)`` gives the frame's cell records and ``planes(frame)``
+    spreads them over ``rows x cols`` arrays.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.frames = _Mapped(path)
+        self.cell_records = _Mapped(path + '.cells')
+        self.trees = _Mapped(path + '.trees')
+        self.rows = self.frames.rows
+        self.cols = self.frames.cols
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, index: int) -> np.void:
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError(f"frame {index} out of range, {count} frames recorded")
+        return self.frames.records(FRAME, index + 1)[index]
+
+    def cells(self, frame: np.void) -> np.ndarray:
+        first, count = int(frame['first']), int(frame['cells'])
+        return self.cell_records.records(CELL, first + count)[first:]
+
+    def planes(self, frame: np.void) -> Dict[str, np.ndarray]:
+        """``rows x cols`` arrays of owner and state (-1 where empty), ``energy`` and ``last_energy``."""
+        cells = self.cells(frame)
+        planes = {}
+        for name in ('owner', 'state', 'energy', 'last_energy'):
+            empty = -1 if name in ('owner', 'state') else 0
+            plane = planes[name] = np.full((self.rows, self.cols), empty, CELL[name])
+            plane[cells['y'], cells['x']] = cells[name]
+        return planes
+
+    def colors(self, frame: np.void) -> Tuple[np.ndarray, np.ndarray]:
+        """Tree color and family color of each of ``cells(frame)``, as ``(n, 3)`` arrays."""
+        owner = self.cells(frame)['owner']
+        table = self.trees.records(TREE, int(frame['trees']))
+        records = np.searchsorted(table['id'], owner)
+        reset = (records < frame['reset_trees'])[:, None]
+        return table['color'][records], np.where(reset, table['color'][records], table['ancestral'][records])
+
+
+def describe(path: str) -> str:
+    trajectory = Trajectory(path)
+    if not len(trajectory):
+        return f"{path}: {trajectory.cols}x{trajectory.rows} world, no frames"
+    first, last = trajectory[0], trajectory[-1]
+    return (f"{path}: {trajectory.cols}x{trajectory.rows} world, {len(trajectory)} frames "
+            f"(steps {first['step']}-{last['step']}), {len(trajectory.trees)} trees, "
+            f"{(last['first'] + last['cells']) * CELL.itemsize // len(trajectory)} bytes of cells per frame")
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:]:
+        print(describe(name))
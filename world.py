@@ -0,0 +1,426 @@
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+
+def resolve_claims(positions: np.ndarray) -> np.ndarray:
+    """Pick one winner per position among competing claims.
+
+    ``positions`` holds the flat grid index each claim targets, in priority
+    order: for every position the earliest claim wins. Returns the indices of
+    the winning claims in ascending (priority) order.
+    """
+    order = np.lexsort((np.arange(len(positions)), positions))
+    ordered = positions[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = ordered[1:] != ordered[:-1]
+    return np.sort(order[first])
+
+
+class CellStore:
+    """Struct-of-arrays storage for per-cell data, indexed by slot.
+
+    Every field is a typed NumPy array, so a cell costs a few dozen bytes
+    instead of a Python object with a ``__dict__``, and whole-world passes
+    such as photosynthesis can run over the arrays directly. Freed slots are
+    reused before the arrays grow. ``order`` numbers cells in allocation
+    order, which is also the order they join their tree's frontier.
+
+    Arrays come from ``zeros``, which takes NumPy's ``zeros`` arguments;
+    ``parallel.WorkerPool`` passes one that allocates in shared memory.
+    """
+
+    fields = (
+        ('x', np.int32),
+        ('y', np.int16),
+        ('state', np.int8),
+        ('energy', np.int32),
+        ('last_energy', np.int32),
+        ('gene', np.int8),
+        ('tree', np.int32),
+        ('order', np.int64),
+        ('alive', np.bool_),
+    )
+
+    def __init__(self, capacity: int = 1024, zeros: Callable[..., np.ndarray] = np.zeros) -> None:
+        self.capacity = capacity
+        self.zeros = zeros
+        for name, dtype in self.fields:
+            setattr(self, name, zeros(capacity, dtype=dtype))
+        self.free_slots: List[int] = []
+        self.size = 0
+        self.count = 0
+        self.allocated = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def allocate(self, x: int, y: int, tree: int, gene: int = 0) -> int:
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            if self.size == self.capacity:
+                self._grow()
+            slot = self.size
+            self.size += 1
+
+        self.x[slot] = x
+        self.y[slot] = y
+        self.state[slot] = 0
+        self.energy[slot] = 0
+        self.last_energy[slot] = 0
+        self.gene[slot] = gene
+        self.tree[slot] = tree
+        self.order[slot] = self.allocated
+        self.alive[slot] = True
+        self.count += 1
+        self.allocated += 1
+        return slot
+
+    def extend(self, values: Dict[str, np.ndarray]) -> np.ndarray:
+        """Allocate one slot per entry of the equal-length ``values`` arrays, in bulk.
+
+        ``values`` maps field names to the data of the new cells; missing
+        fields start at zero. Returns the new slots.
+        """
+        count = len(next(iter(values.values())))
+        while self.size + count > self.capacity:
+            self._grow()
+        slots = np.arange(self.size, self.size + count)
+        for name, _ in self.fields:
+            getattr(self, name)[slots] = values.get(name, 0)
+        self.alive[slots] = True
+        self.size += count
+        self.count += count
+        return slots
+
+    def free(self, slot: int) -> None:
+        self.alive[slot] = False
+        self.free_slots.append(slot)
+        self.count -= 1
+
+    def live(self) -> np.ndarray:
+        return np.flatnonzero(self.alive[:self.size])
+
+    def _grow(self) -> None:
+        self.capacity *= 2
+        self.move_to(self.zeros)
+
+    def move_to(self, zeros: Callable[..., np.ndarray]) -> None:
+        """Reallocate every field with ``zeros`` from now on, keeping the data."""
+        self.zeros = zeros
+        for name, _ in self.fields:
+            values = getattr(self, name)
+            moved = zeros(self.capacity, dtype=values.dtype)
+            moved[:len(values)] = values
+            setattr(self, name, moved)
+
+
+class ChangeSet(NamedTuple):
+    """What one step did to the world.
+
+    To bring a picture of the world up to date, clear the old positions of
+    ``removed`` and ``moved`` cells first, then draw the new positions of
+    ``moved`` and ``added`` cells and the cells whose state ``changed``. A
+    cell born where another cell was removed in the same step appears in
+    both ``removed`` and ``added``.
+    """
+    step: int
+    added: np.ndarray     # (n, 3): x, y, tree id
+    moved: np.ndarray     # (n, 4): old x, old y, x, y
+    removed: np.ndarray   # (n, 2): x, y
+    changed: np.ndarray   # (n, 3): x, y, new state
+    born: np.ndarray      # ids of new trees
+    died: np.ndarray      # ids of trees that stopped living; their seeds keep falling
+    cleared: np.ndarray   # ids of trees gone from the world
+
+
+class ChangeLog:
+    """Collects cell and tree events between steps; see ``WorldGrid.subscribe``.
+
+    Each touched cell is remembered with its position and state when it was
+    first touched, so ``collect`` reports one net change per cell, however
+    often it moved.
+    """
+
+    def __init__(self, store: CellStore) -> None:
+        self.store = store
+        self.clear()
+
+    def clear(self) -> None:
+        self.cells: Dict['Cell', Optional[Tuple[int, int, int]]] = {}
+        self.removed: Set['Cell'] = set()
+        self.born: List[int] = []
+        self.died: List[int] = []
+        self.cleared: List[int] = []
+
+    def add(self, cell: 'Cell') -> None:
+        if cell not in self.cells:
+            self.cells[cell] = None
+
+    def touch(self, cell: 'Cell') -> None:
+        if cell not in self.cells:
+            store, slot = self.store, cell.slot
+            self.cells[cell] = (int(store.x[slot]), int(store.y[slot]), int(store.state[slot]))
+
+    def remove(self, cell: 'Cell') -> None:
+        self.touch(cell)
+        self.removed.add(cell)
+
+    def collect(self, step: int) -> ChangeSet:
+        """The changes since the last ``collect``, which starts a new log."""
+        removed, added, kept, before = [], [], [], []
+        for cell, first in self.cells.items():
+            if cell in self.removed:
+                if first is not None:
+                    removed.append(first[:2])
+            elif first is None:
+                added.append(cell)
+            else:
+                kept.append(cell.slot)
+                before.append(first)
+
+        store = self.store
+        slots = np.array([cell.slot for cell in added], dtype=np.int64)
+        added = _rows([], 3) if not added else np.stack(
+            [store.x[slots], store.y[slots], [cell.tree.id for cell in added]], axis=1).astype(np.int64)
+
+        slots = np.array(kept, dtype=np.int64)
+        before = _rows(before, 3)
+        after = _rows([], 3) if not kept else np.stack(
+            [store.x[slots], store.y[slots], store.state[slots]], axis=1).astype(np.int64)
+        moved = (before[:, :2] != after[:, :2]).any(axis=1)
+        changed = before[:, 2] != after[:, 2]
+
+        changes = ChangeSet(step, added, np.hstack([before[moved, :2], after[moved, :2]]), _rows(removed, 2),
+                            after[changed], np.array(self.born, dtype=np.int64),
+                            np.array(self.died, dtype=np.int64), np.array(self.cleared, dtype=np.int64))
+        self.clear()
+        return changes
+
+
+def _rows(rows: List[Tuple[int, ...]], width: int) -> np.ndarray:
+    return np.array(rows, dtype=np.int64).reshape(-1, width)
+
+
+class WorldGrid:
+    """Dense ``rows x cols`` arrays describing every position of the world.
+
+    ``occupied``, ``owner`` and ``slot`` say which cell of which tree sits at
+    each position; the cell's own data lives in ``store``. ``state``,
+    ``gene``, ``energy`` and ``last_energy`` gather that data back into
+    per-position arrays for readers that want a picture of the whole world.
+
+    Trees report every add, move and removal, so a step never has to rebuild
+    the grid from scratch. ``rebuild`` and ``check`` walk all trees and are
+    meant for loading worlds and for debugging.
+
+    ``ghosts`` are positions held by cells that live in another process (see
+    ``strips.py``): they are occupied and shade their column, but have no
+    cell, owner or slot here.
+
+    Adds, moves and removals are reported to every ``ChangeLog`` in
+    ``changes``; each reader (a renderer, a recorder, ``iter_steps``) takes
+    its own with ``subscribe`` and collects it on its own schedule.
+    ``place`` and ``rebuild`` replace whole worlds and are not reported.
+    """
+
+    def __init__(self, cols: int, rows: int) -> None:
+        self.cols = cols
+        self.rows = rows
+        shape = (rows, cols)
+        self.occupied = np.zeros(shape, dtype=bool)
+        self.owner = np.full(shape, -1, dtype=np.int32)
+        self.slot = np.full(shape, -1, dtype=np.int32)
+        self.cells = np.full(shape, None, dtype=object)
+        self.store = CellStore()
+        self.count = 0
+        self.ghosts: List[Tuple[int, int]] = []
+        self.changes: List[ChangeLog] = []
+
+    def __contains__(self, position: Tuple[int, int]) -> bool:
+        x, y = position
+        return 0 <= x < self.cols and 0 <= y < self.rows and bool(self.occupied[y, x])
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def state(self) -> np.ndarray:
+        return self._gather(self.store.state)
+
+    @property
+    def gene(self) -> np.ndarray:
+        return self._gather(self.store.gene)
+
+    @property
+    def energy(self) -> np.ndarray:
+        return self._gather(self.store.energy)
+
+    @property
+    def last_energy(self) -> np.ndarray:
+        return self._gather(self.store.last_energy)
+
+    def _gather(self, values: np.ndarray) -> np.ndarray:
+        result = np.zeros(self.occupied.shape, dtype=values.dtype)
+        result[self.occupied] = values[self.slot[self.occupied]]
+        return result
+
+    def get(self, x: int, y: int) -> Optional['Cell']:
+        if 0 <= x < self.cols and 0 <= y < self.rows:
+            return self.cells[y, x]
+        return None
+
+    def positions(self) -> List[Tuple[int, int]]:
+        ys, xs = np.nonzero(self.slot >= 0)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def landing_row(self, x: int, y: int) -> int:
+        """Row where something dropped from ``y`` in column ``x`` comes to rest."""
+        below = np.flatnonzero(self.occupied[y + 1:, x])
+        return y + int(below[0]) if len(below) else self.rows - 1
+
+    def move_to(self, zeros: Callable[..., np.ndarray]) -> None:
+        """Reallocate ``occupied`` and the cell store with ``zeros`` (see ``CellStore``), keeping the data."""
+        occupied = zeros(self.occupied.shape, dtype=bool)
+        occupied[...] = self.occupied
+        self.occupied = occupied
+        self.store.move_to(zeros)
+
+    def subscribe(self) -> ChangeLog:
+        """A new ``ChangeLog`` that hears about every change from now on."""
+        log = ChangeLog(self.store)
+        self.changes.append(log)
+        return log
+
+    def unsubscribe(self, log: ChangeLog) -> None:
+        if log in self.changes:
+            self.changes.remove(log)
+
+    def add(self, cell: 'Cell') -> None:
+        for log in self.changes:
+            log.add(cell)
+        x, y = cell.x, cell.y
+        if not self.occupied[y, x]:
+            self.count += 1
+
+        self.occupied[y, x] = True
+        self.owner[y, x] = cell.tree.id
+        self.slot[y, x] = cell.slot
+        self.cells[y, x] = cell
+
+    def move(self, cell: 'Cell', x: int, y: int) -> None:
+        for log in self.changes:
+            log.touch(cell)
+        self._take(cell)
+        self.store.x[cell.slot] = x
+        self.store.y[cell.slot] = y
+        self.add(cell)
+
+    def remove(self, cell: 'Cell') -> None:
+        """Take ``cell`` out of the world and release its storage slot."""
+        for log in self.changes:
+            log.remove(cell)
+        self._take(cell)
+        self.store.free(cell.slot)
+
+    def _take(self, cell: 'Cell') -> None:
+        # A seedling is born on top of the seed that produced it, so the seed
+        # may already have been replaced at its position.
+        x, y = cell.x, cell.y
+        if self.cells[y, x] is cell:
+            self.occupied[y, x] = False
+            self.owner[y, x] = -1
+            self.slot[y, x] = -1
+            self.cells[y, x] = None
+            self.count -= 1
+
+    def set_ghosts(self, xs: np.ndarray, ys: np.ndarray) -> None:
+        """Replace the ghost positions with ``zip(xs, ys)``."""
+        for x, y in self.ghosts:
+            self.occupied[y, x] = False
+
+        self.ghosts = list(zip(xs.tolist(), ys.tolist()))
+        for x, y in self.ghosts:
+            self.occupied[y, x] = True
+
+    def place(self, cells: List['Cell']) -> None:
+        """Add many cells at once; their positions must be free and distinct."""
+        if not cells:
+            return
+        slots = np.array([cell.slot for cell in cells], dtype=np.int64)
+        xs, ys = self.store.x[slots], self.store.y[slots]
+        self.occupied[ys, xs] = True
+        self.owner[ys, xs] = self.store.tree[slots]
+        self.slot[ys, xs] = slots
+        objects = np.empty(len(cells), dtype=object)
+        objects[:] = cells
+        self.cells[ys, xs] = objects
+        self.count += len(cells)
+
+    def rebuild(self, trees: Iterable['Tree']) -> None:
+        """Recompute occupancy and ownership from the trees' cell lists."""
+        expected = self._collect(trees)
+        self.occupied[...] = False
+        self.owner[...] = -1
+        self.slot[...] = -1
+        self.cells[...] = None
+        for (x, y), cell in expected.items():
+            self.occupied[y, x] = True
+            self.owner[y, x] = cell.tree.id
+            self.slot[y, x] = cell.slot
+            self.cells[y, x] = cell
+
+        self.count = len(expected)
+        self.ghosts = []
+
+    def check(self, trees: Iterable['Tree']) -> List[Tuple[int, int]]:
+        """Return the positions where the grid disagrees with a full rebuild."""
+        expected = self._collect(trees)
+        positions = set(expected) | set(self.positions())
+        mismatched = set()
+        for x, y in positions:
+            cell = self.cells[y, x]
+            if (cell is None or expected.get((x, y)) is not cell
+                    or not self.occupied[y, x] or self.owner[y, x] != cell.tree.id
+                    or self.slot[y, x] != cell.slot or not self.store.alive[cell.slot]):
+                mismatched.add((x, y))
+
+        if self.count != len(expected) or self.store.count != len(expected):
+            mismatched.add((-1, -1))
+
+        return sorted(mismatched)
+
+    @staticmethod
+    def _collect(trees: Iterable['Tree']) -> Dict[Tuple[int, int], 'Cell']:
+        cells = {}
+        for tree in trees:
+            for cell in tree.cells:
+                cells[(cell.x, cell.y)] = cell
+        return cells
+
+
+class CellGridView(Mapping):
+    """Read-only ``(x, y) -> Cell`` mapping over a ``WorldGrid``.
+
+    Kept for code written against the old dict-based ``cell_grid``.
+    """
+
+    def __init__(self, grid: WorldGrid) -> None:
+        self.grid = grid
+
+    def __getitem__(self, position: Tuple[int, int]) -> 'Cell':
+        cell = self.grid.get(*position)
+        if cell is None:
+            raise KeyError(position)
+        return cell
+
+    def __contains__(self, position: object) -> bool:
+        return position in self.grid
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(self.grid.positions())
+
+    def __len__(self) -> int:
+        return len(self.grid)